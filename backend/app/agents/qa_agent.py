@@ -1,47 +1,235 @@
-from typing import List, Dict, Any
+import re
+from typing import List, Dict, Any, Optional
+from ..core.config import settings
 from ..core.database import db
 from ..services.deepseek_client import deepseek_client
+from ..services.document_processor import document_processor
+from ..services.reranker import reranker
+from ..services.semantic_cache import semantic_cache
+from ..services.session_store import session_store, content_words
+from ..services.search_index import search_indexes
+from ..services.embeddings import tokenize
+from ..services.admission import admission_controller, single_flight, AdmissionRejected
+
+
+# Only what passage splitting needs, not every column of each document
+SEARCH_COLUMNS = "id, filename, file_type, content, updated_at, page_offsets"
 
 
 class QAAgent:
     def __init__(self):
         self.supabase = db.get_client()
     
-    async def answer_question(self, question: str) -> Dict[str, Any]:
-        """Answer a question using relevant documents"""
+    async def answer_question(
+        self,
+        question: str,
+        session: Optional[Dict[str, Any]] = None,
+        collection_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Answer a question using relevant documents from one collection"""
         try:
-            # Find relevant documents
-            relevant_docs = await self._find_relevant_documents(question)
-            
-            if not relevant_docs:
-                return {
-                    "answer": "I couldn't find any relevant documents to answer your question.",
-                    "cited_documents": [],
-                    "document_details": []
-                }
+            if session is not None:
+                return await self._answer_in_session(question, session)
             
-            # Generate answer using DeepSeek
-            result = await deepseek_client.generate_answer(question, relevant_docs)
+            collection_id = collection_id or settings.DEFAULT_COLLECTION
+            if settings.SEMANTIC_CACHE_ENABLED:
+                cached = await self._lookup_cached_answer(question, collection_id)
+                if cached:
+                    return cached
             
-            # Add document details for citation
-            document_details = []
-            for doc in relevant_docs:
-                document_details.append({
-                    "id": doc["id"],
-                    "filename": doc["filename"],
-                    "file_type": doc["file_type"]
-                })
+            # Concurrent identical questions share a single computation;
+            # questions without any word characters are never coalesced
+            normalized = self._normalize_question(question)
+            if normalized:
+                response, coalesced = await single_flight.do(
+                    f"{collection_id}:{normalized}",
+                    lambda: self._answer_and_cache(question, collection_id)
+                )
+            else:
+                response, coalesced = await self._answer_and_cache(question, collection_id), False
             
-            return {
-                "answer": result["answer"],
-                "cited_documents": result["cited_documents"],
-                "document_details": document_details
-            }
+            return {**response, "cached": False, "coalesced": coalesced, "collection_id": collection_id}
             
+        except AdmissionRejected:
+            raise
         except Exception as e:
             raise Exception(f"QA Agent error: {str(e)}")
     
-    async def _find_relevant_documents(self, question: str) -> List[Dict[str, Any]]:
+    async def _answer_and_cache(self, question: str, collection_id: str) -> Dict[str, Any]:
+        """Generate an answer under admission control and store it in the cache"""
+        async with admission_controller.slot():
+            response = await self._generate_response(question, collection_id)
+        response.pop("_top_passages")
+        document_versions = response.pop("_document_versions")
+        
+        # Only answers backed by documents are worth caching, and never degraded ones
+        if settings.SEMANTIC_CACHE_ENABLED and response["cited_documents"] and not response["degraded"]:
+            semantic_cache.store(question, response, document_versions, collection_id)
+        
+        return response
+    
+    async def _answer_in_session(self, question: str, session: Dict[str, Any]) -> Dict[str, Any]:
+        """Answer a follow-up using the session's history and earlier passages"""
+        standalone_question = session_store.rewrite_question(session, question)
+        history = session_store.render_history(session) or None
+        
+        async with admission_controller.slot():
+            response = await self._generate_response(
+                standalone_question,
+                session["collection_id"],
+                question=question,
+                history=history,
+                candidate_passages=self._reusable_passages(session, question)
+            )
+        top_passages = response.pop("_top_passages")
+        response.pop("_document_versions")
+        
+        session_store.add_turn(session, question, standalone_question, response["answer"], top_passages)
+        
+        return {
+            **response,
+            "cached": False,
+            "session_id": session["id"],
+            "collection_id": session["collection_id"],
+            "standalone_question": standalone_question
+        }
+    
+    def _reusable_passages(self, session: Dict[str, Any], question: str) -> Optional[List[Dict[str, Any]]]:
+        """Previous turn's passages, if they cover what the follow-up itself asks about.
+
+        Only the follow-up's own words are checked: the standalone query is
+        built from the previous one and would always look similar to it.
+        """
+        if not session["passages"]:
+            return None
+        
+        words = content_words(question)
+        if words:
+            known = set(tokenize(session["passages_query"] or ""))
+            for passage in session["passages"]:
+                known.update(tokenize(passage["text"]))
+            coverage = sum(word in known for word in words) / len(words)
+            if coverage < settings.SESSION_PASSAGE_REUSE_THRESHOLD:
+                return None
+        
+        print(f"Reusing {len(session['passages'])} session passages")
+        return [dict(passage) for passage in session["passages"]]
+    
+    async def _lookup_cached_answer(self, question: str, collection_id: str) -> Optional[Dict[str, Any]]:
+        """Serve a cached answer for a similar question if its documents are unchanged"""
+        match = semantic_cache.lookup(question, collection_id)
+        if not match:
+            return None
+        
+        slot, entry, similarity = match
+        if not self._documents_unchanged(entry["document_versions"]):
+            print(f"Semantic cache entry for '{entry['question']}' is stale")
+            semantic_cache.invalidate(slot)
+            return None
+        
+        semantic_cache.record_hit(slot)
+        print(f"Semantic cache hit ({similarity:.3f}) for '{entry['question']}'")
+        return {**entry["response"], "cached": True, "collection_id": collection_id}
+    
+    def _documents_unchanged(self, document_versions: Dict[str, Any]) -> bool:
+        """Check that cited documents still exist with the same updated_at"""
+        try:
+            result = self.supabase.table("documents").select("id, updated_at").in_(
+                "id", list(document_versions.keys())
+            ).execute()
+            current = {doc["id"]: doc["updated_at"] for doc in result.data}
+            return current == document_versions
+        except Exception as e:
+            print(f"Cache validation error: {str(e)}")
+            return False
+    
+    async def _generate_response(
+        self,
+        search_query: str,
+        collection_id: str,
+        question: Optional[str] = None,
+        history: Optional[str] = None,
+        candidate_passages: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """Retrieve, rerank and generate an answer without consulting the cache"""
+        question = question or search_query
+        
+        if candidate_passages is None:
+            candidate_passages = await self._find_candidate_passages(search_query, collection_id)
+        
+        if not candidate_passages:
+            return {
+                "answer": "I couldn't find any relevant documents to answer your question.",
+                "cited_documents": [],
+                "document_details": [],
+                "passages": [],
+                "citations": [],
+                "degraded": False,
+                "_top_passages": [],
+                "_document_versions": {}
+            }
+        
+        # Rerank passages from the wider candidate set
+        ranking = reranker.rerank(search_query, candidate_passages)
+        top_passages = ranking["passages"]
+        print(f"Reranked {ranking['stats']['candidates']} passages in {ranking['stats']['elapsed_ms']}ms")
+        
+        # Generate answer using DeepSeek
+        result = await deepseek_client.generate_answer(question, top_passages, history)
+        
+        # Add details of the cited documents, in citation order
+        document_details = []
+        for document_id in result["cited_documents"]:
+            passage = next(p for p in top_passages if p["document_id"] == document_id)
+            document_details.append({
+                "id": document_id,
+                "filename": passage["filename"],
+                "file_type": passage["file_type"]
+            })
+        
+        return {
+            "answer": result["answer"],
+            "cited_documents": result["cited_documents"],
+            "document_details": document_details,
+            "passages": [self._describe_passage(passage, label) for label, passage in enumerate(top_passages, 1)],
+            "citations": [self._describe_passage(top_passages[i], i + 1) for i in result["cited_passages"]],
+            "rerank_stats": ranking["stats"],
+            "degraded": result["degraded"],
+            "_top_passages": top_passages,
+            "_document_versions": {
+                passage["document_id"]: passage["updated_at"]
+                for passage in top_passages
+                if passage["document_id"] in result["cited_documents"]
+            }
+        }
+    
+    def _describe_passage(self, passage: Dict[str, Any], label: int) -> Dict[str, Any]:
+        """Public view of a passage: where it is, not what it says"""
+        return {
+            "label": label,
+            "document_id": passage["document_id"],
+            "filename": passage["filename"],
+            "page": passage.get("page"),
+            "start": passage["start"],
+            "end": passage["end"],
+            "score": passage["score"]
+        }
+    
+    async def _find_candidate_passages(self, search_query: str, collection_id: str) -> List[Dict[str, Any]]:
+        """Candidate passages from the collection's in-process index, or from database search"""
+        index = search_indexes.get_ready(collection_id) if settings.SEARCH_INDEX_ENABLED else None
+        if index is not None:
+            index.maybe_refresh()
+            passages = index.search(search_query, settings.RETRIEVAL_CANDIDATES)
+            if passages:
+                return passages
+            # The index only knows ASCII terms; database search also matches other scripts
+        
+        # Find relevant documents
+        relevant_docs = await self._find_relevant_documents(search_query, collection_id)
+        return self._collect_passages(relevant_docs)
+    
+    async def _find_relevant_documents(self, question: str, collection_id: str) -> List[Dict[str, Any]]:
         """Find documents relevant to the question using text search"""
         try:
             # Use PostgreSQL full-text search
@@ -50,17 +238,16 @@ class QAAgent:
             print(f"Searching for: {question}")
             print(f"Search query: {search_query}")
             
-            # Search in document content and filename
-            result = self.supabase.table("documents").select("*").or_(
-                f"content.fts.{search_query},filename.ilike.%{question}%"
-            ).limit(5).execute()
-            
-            print(f"Search result: {result}")
+            # Search in document content and filename; the english config matches
+            # the (collection_id, tsvector) index so only this collection is scanned
+            result = self.supabase.table("documents").select(SEARCH_COLUMNS).eq("collection_id", collection_id).or_(
+                f"content.fts(english).{search_query},filename.ilike.%{question}%"
+            ).limit(settings.RETRIEVAL_CANDIDATES).execute()
             
             if hasattr(result, 'error') and result.error:
                 print(f"Search error: {result.error}")
                 # Fallback to simple text search
-                return await self._fallback_search(question)
+                return await self._fallback_search(question, collection_id)
             
             # Filter out documents without content, but keep images with OCR text
             relevant_docs = []
@@ -74,16 +261,16 @@ class QAAgent:
         except Exception as e:
             print(f"Search error: {str(e)}")
             # Fallback to simple search
-            return await self._fallback_search(question)
+            return await self._fallback_search(question, collection_id)
     
-    async def _fallback_search(self, question: str) -> List[Dict[str, Any]]:
+    async def _fallback_search(self, question: str, collection_id: str) -> List[Dict[str, Any]]:
         """Fallback search method using simple text matching"""
         try:
             print(f"Using fallback search for: {question}")
-            # Get all documents with content
-            result = self.supabase.table("documents").select("*").not_.is_("content", "null").execute()
-            
-            print(f"Fallback query result: {result}")
+            # Get all documents in the collection with content
+            result = self.supabase.table("documents").select(SEARCH_COLUMNS).eq(
+                "collection_id", collection_id
+            ).not_.is_("content", "null").execute()
             
             if hasattr(result, 'error') and result.error:
                 print(f"Fallback query error: {result.error}")
@@ -110,15 +297,31 @@ class QAAgent:
                         doc["_score"] = score
                         relevant_docs.append(doc)
             
-            # Sort by relevance score and return top 5
+            # Sort by relevance score and return the candidate set for reranking
             relevant_docs.sort(key=lambda x: x["_score"], reverse=True)
             print(f"Fallback found {len(relevant_docs)} relevant documents")
-            return relevant_docs[:5]
+            return relevant_docs[:settings.RETRIEVAL_CANDIDATES]
             
         except Exception as e:
             print(f"Fallback search error: {str(e)}")
             return []
     
+    def _collect_passages(self, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Split candidate documents into passages carrying their source document"""
+        passages = []
+        for doc in documents:
+            for passage in document_processor.split_into_passages(doc["content"], page_offsets=doc.get("page_offsets")):
+                passage["document_id"] = doc["id"]
+                passage["filename"] = doc["filename"]
+                passage["file_type"] = doc["file_type"]
+                passage["updated_at"] = doc.get("updated_at")
+                passages.append(passage)
+        return passages
+    
+    def _normalize_question(self, question: str) -> str:
+        """Canonical form used to coalesce identical questions"""
+        return " ".join(re.findall(r"\w+", question.casefold()))
+    
     def _prepare_search_query(self, question: str) -> str:
         """Prepare search query for PostgreSQL full-text search"""
         # Remove special characters and create search terms
@@ -1,13 +1,25 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import List, Dict, Any
+import ipaddress
+import math
+from functools import lru_cache
+from fastapi import APIRouter, HTTPException, Request, Query
+from pydantic import BaseModel, Field
+from typing import List, Dict, Any, Optional
 from ..agents.qa_agent import qa_agent
+from ..core.config import settings
+from ..models.document import COLLECTION_ID_PATTERN
+from ..services.semantic_cache import semantic_cache
+from ..services.session_store import session_store
+from ..services.admission import admission_controller, single_flight, AdmissionRejected
+from ..services.llm_gateway import llm_gateway
+from ..services.search_index import search_indexes
 
 router = APIRouter()
 
 
 class ChatRequest(BaseModel):
     question: str
+    session_id: Optional[str] = None
+    collection_id: Optional[str] = Field(None, pattern=COLLECTION_ID_PATTERN)  # Defaults to the default collection
 
 
 class DocumentDetail(BaseModel):
@@ -16,21 +28,48 @@ class DocumentDetail(BaseModel):
     file_type: str
 
 
+class RankedPassage(BaseModel):
+    label: int  # The [n] marker used for this passage in the answer
+    document_id: str
+    filename: str
+    page: Optional[int] = None
+    start: int  # Character offsets into the document's extracted text
+    end: int
+    score: float
+
+
 class ChatResponse(BaseModel):
     answer: str
     cited_documents: List[str]
     document_details: List[DocumentDetail]
+    passages: List[RankedPassage] = []
+    citations: List[RankedPassage] = []  # Passages the answer actually cites
+    cached: bool = False
+    degraded: bool = False  # True when the LLM was unavailable and excerpts were returned
+    session_id: Optional[str] = None
+    collection_id: Optional[str] = None  # Collection the answer was searched in
+    standalone_question: Optional[str] = None
 
 
 @router.post("/", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request):
     """Answer a question using the knowledge base"""
     try:
         if not request.question.strip():
             raise HTTPException(status_code=400, detail="Question cannot be empty")
         
+        admission_controller.check_rate(_client_address(http_request))
+        
+        session = None
+        if request.session_id:
+            session = session_store.get(request.session_id)
+            if session is None:
+                raise HTTPException(status_code=404, detail="Session not found or expired")
+            if request.collection_id and request.collection_id != session["collection_id"]:
+                raise HTTPException(status_code=400, detail="Session belongs to a different collection")
+        
         # Get answer from QA agent
-        result = await qa_agent.answer_question(request.question)
+        result = await qa_agent.answer_question(request.question, session, request.collection_id)
         
         # Format document details
         document_details = []
@@ -44,13 +83,109 @@ async def chat(request: ChatRequest):
         return ChatResponse(
             answer=result["answer"],
             cited_documents=result["cited_documents"],
-            document_details=document_details
+            document_details=document_details,
+            passages=[RankedPassage(**passage) for passage in result.get("passages", [])],
+            citations=[RankedPassage(**passage) for passage in result.get("citations", [])],
+            cached=result.get("cached", False),
+            degraded=result.get("degraded", False),
+            session_id=result.get("session_id"),
+            collection_id=result.get("collection_id"),
+            standalone_question=result.get("standalone_question")
         )
         
+    except HTTPException:
+        raise
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=429,
+            detail=e.reason,
+            headers={"Retry-After": str(math.ceil(e.retry_after))}
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Chat error: {str(e)}")
 
 
+@lru_cache(maxsize=1)
+def _trusted_networks(proxies: tuple) -> tuple:
+    return tuple(ipaddress.ip_network(proxy.strip(), strict=False) for proxy in proxies)
+
+
+def _is_trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in _trusted_networks(tuple(settings.TRUSTED_PROXIES)))
+
+
+def _client_address(request: Request) -> str:
+    """Address used for rate limiting; never taken from a header the caller controls"""
+    peer = request.client.host if request.client else "anonymous"
+    if not _is_trusted_proxy(peer):
+        return peer
+    
+    # Behind our own proxies, the client is the rightmost address they did not add
+    forwarded = [address.strip() for address in request.headers.get("X-Forwarded-For", "").split(",")]
+    for address in reversed(forwarded):
+        if address and not _is_trusted_proxy(address):
+            return address
+    return peer
+
+
+@router.post("/sessions")
+async def create_session(collection_id: Optional[str] = Query(None, pattern=COLLECTION_ID_PATTERN)):
+    """Start a multi-turn conversation session within one collection"""
+    session = session_store.create(collection_id)
+    return {
+        "session_id": session["id"],
+        "collection_id": session["collection_id"],
+        "ttl_seconds": session_store.ttl_seconds
+    }
+
+
+@router.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+    """Get the turns and rolled-up summary of a session"""
+    session = session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return session_store.describe(session)
+
+
+@router.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    """End a conversation session"""
+    if not session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return {"message": "Session deleted successfully"}
+
+
+@router.get("/stats")
+async def chat_stats():
+    """Load, coalescing, cache, session and search index counters"""
+    return {
+        "admission": admission_controller.stats(),
+        "coalescing": single_flight.stats(),
+        "llm": llm_gateway.stats(),
+        "cache": semantic_cache.stats(),
+        "sessions": session_store.stats(),
+        "search_indexes": search_indexes.stats()
+    }
+
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Semantic answer cache hit rate, threshold and eviction counters"""
+    return semantic_cache.stats()
+
+
+@router.delete("/cache")
+async def clear_cache():
+    """Drop every cached answer"""
+    semantic_cache.clear()
+    return {"message": "Semantic cache cleared"}
+
+
 @router.get("/health")
 async def health_check():
     """Health check endpoint"""
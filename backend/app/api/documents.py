@@ -1,18 +1,66 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Query
-from typing import List, Optional
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import Any, Callable, Dict, Iterator, List, Optional
+import hashlib
+import itertools
 import uuid
 from datetime import datetime
-from ..models.document import DocumentResponse, DocumentPreview, DocumentType
+from ..models.document import DocumentResponse, DocumentPreview, DocumentType, CollectionSummary, COLLECTION_ID_PATTERN
 from ..services.storage import storage_service
 from ..services.document_processor import document_processor
+from ..core.config import settings
 from ..core.database import db
+from ..core.responses import ORJSONResponse, stream_json_array, stream_json_object
 
 router = APIRouter()
 
+LISTING_FIELDS = ("id", "filename", "file_type", "file_size", "upload_date", "collection_id", "metadata", "thumbnail_path")
+LISTING_COLUMNS = ", ".join(LISTING_FIELDS)
+LISTING_PAGE_SIZE = 500  # Rows fetched and encoded per chunk of a streamed listing
+PREVIEW_COLUMNS = "id, filename, file_type, file_path, preview_text, preview_truncated, thumbnail_path, updated_at"
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison: any listed validator, weak or strong, or *"""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return any(candidate == "*" or candidate.removeprefix("W/") == etag for candidate in candidates)
+
+
+def _thumbnail_url(doc: dict) -> Optional[str]:
+    return storage_service.get_public_url(doc["thumbnail_path"]) if doc.get("thumbnail_path") else None
+
+
+def _listing_row(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """A database row in DocumentResponse shape.
+
+    Rows are selected with LISTING_COLUMNS and file_type is enforced by the
+    table's CHECK constraint, so they are passed through as they are; only
+    the thumbnail path is turned into a URL. Timestamps stay ISO-8601 strings.
+    """
+    doc["thumbnail_url"] = _thumbnail_url(doc)
+    doc.pop("thumbnail_path", None)
+    return doc
+
+
+def _listing_pages(build_query: Callable[[], Any]) -> Iterator[List[Dict[str, Any]]]:
+    """Listing rows page by page, so only one page is held in memory at a time"""
+    offset = 0
+    while True:
+        result = build_query().range(offset, offset + LISTING_PAGE_SIZE - 1).execute()
+        yield [_listing_row(doc) for doc in result.data]
+        if len(result.data) < LISTING_PAGE_SIZE:
+            return
+        offset += LISTING_PAGE_SIZE
+
 
 @router.post("/upload", response_model=List[DocumentResponse])
-async def upload_documents(files: List[UploadFile] = File(...)):
-    """Upload multiple documents"""
+async def upload_documents(
+    files: List[UploadFile] = File(...),
+    collection_id: str = Query(settings.DEFAULT_COLLECTION, pattern=COLLECTION_ID_PATTERN)
+):
+    """Upload multiple documents into a collection"""
     uploaded_docs = []
     supabase = db.get_client()
     
@@ -25,8 +73,8 @@ async def upload_documents(files: List[UploadFile] = File(...)):
             file.file.seek(0)  # Reset file pointer
             content = await file.read()
             
-            # Extract text content
-            text_content = document_processor.extract_text_content(
+            # Extract text content and page boundaries
+            text_content, page_offsets = document_processor.extract_text_with_pages(
                 content, upload_result["file_type"], file.filename
             )
             
@@ -35,22 +83,39 @@ async def upload_documents(files: List[UploadFile] = File(...)):
                 content, upload_result["file_type"], file.filename
             )
             
+            # Precompute preview assets so the preview endpoint never touches the full content
+            content_hash = document_processor.compute_content_hash(content)
+            thumbnail = document_processor.create_thumbnail(content, upload_result["file_type"])
+            thumbnail_path = None
+            if thumbnail:
+                # A missing thumbnail only degrades the preview; don't fail the upload over it
+                try:
+                    thumbnail_path = storage_service.upload_thumbnail(content_hash, thumbnail)
+                except Exception as e:
+                    print(f"Thumbnail upload failed for {file.filename}: {str(e)}")
+            
+            preview_text, preview_truncated = document_processor.create_preview_text(text_content)
+            
             # Save to database
             doc_data = {
                 "filename": file.filename,
                 "file_type": upload_result["file_type"].value,
                 "file_path": upload_result["file_path"],
                 "file_size": upload_result["file_size"],
+                "collection_id": collection_id,
                 "content": text_content,
                 "metadata": metadata,
+                "page_offsets": page_offsets or None,
+                "content_hash": content_hash,
+                "preview_text": preview_text,
+                "preview_truncated": preview_truncated,
+                "thumbnail_path": thumbnail_path,
                 "upload_date": datetime.utcnow().isoformat(),
                 "created_at": datetime.utcnow().isoformat(),
                 "updated_at": datetime.utcnow().isoformat()
             }
             
-            print(f"Inserting document data: {doc_data}")
             result = supabase.table("documents").insert(doc_data).execute()
-            print(f"Database insert result: {result}")
             
             if hasattr(result, 'error') and result.error:
                 print(f"Database insert error: {result.error}")
@@ -60,103 +125,99 @@ async def upload_documents(files: List[UploadFile] = File(...)):
                 print(f"No data returned from database insert")
                 raise HTTPException(status_code=500, detail="No data returned from database insert")
             
+            # The insert echoes the whole row, content included; keep only listing fields
             doc_record = result.data[0]
-            uploaded_docs.append(DocumentResponse(
-                id=doc_record["id"],
-                filename=doc_record["filename"],
-                file_type=DocumentType(doc_record["file_type"]),
-                file_size=doc_record["file_size"],
-                upload_date=datetime.fromisoformat(doc_record["upload_date"].replace('Z', '+00:00')),
-                metadata=doc_record["metadata"]
-            ))
+            uploaded_docs.append(_listing_row({field: doc_record.get(field) for field in LISTING_FIELDS}))
             
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to upload {file.filename}: {str(e)}")
     
-    return uploaded_docs
+    return ORJSONResponse(uploaded_docs)
 
 
 @router.get("/", response_model=List[DocumentResponse])
-async def get_documents(file_type: Optional[DocumentType] = Query(None)):
-    """Get all documents, optionally filtered by type"""
+async def get_documents(
+    file_type: Optional[DocumentType] = Query(None),
+    collection_id: Optional[str] = Query(None, pattern=COLLECTION_ID_PATTERN)
+):
+    """Get all documents, optionally filtered by type and collection.
+
+    Listings larger than one page are streamed as they are fetched.
+    """
     supabase = db.get_client()
     
-    try:
-        query = supabase.table("documents").select("id, filename, file_type, file_size, upload_date, metadata")
-        
+    def build_query():
+        query = supabase.table("documents").select(LISTING_COLUMNS)
         if file_type:
             query = query.eq("file_type", file_type.value)
-        
-        result = query.order("upload_date", desc=True).execute()
-        
-        if result.error:
-            raise HTTPException(status_code=500, detail=f"Database error: {result.error}")
-        
-        documents = []
-        for doc in result.data:
-            documents.append(DocumentResponse(
-                id=doc["id"],
-                filename=doc["filename"],
-                file_type=DocumentType(doc["file_type"]),
-                file_size=doc["file_size"],
-                upload_date=datetime.fromisoformat(doc["upload_date"].replace('Z', '+00:00')),
-                metadata=doc["metadata"]
-            ))
-        
-        return documents
-        
+        if collection_id:
+            query = query.eq("collection_id", collection_id)
+        return query.order("upload_date", desc=True).order("id")
+    
+    try:
+        # Fetch the first page before responding so database errors still become a 500
+        pages = _listing_pages(build_query)
+        first_page = next(pages)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch documents: {str(e)}")
+    
+    if len(first_page) < LISTING_PAGE_SIZE:
+        return ORJSONResponse(first_page)
+    return StreamingResponse(stream_json_array(itertools.chain([first_page], pages)), media_type="application/json")
 
 
 @router.get("/by-category")
-async def get_documents_by_category():
-    """Get documents organized by category"""
+async def get_documents_by_category(collection_id: Optional[str] = Query(None, pattern=COLLECTION_ID_PATTERN)):
+    """Get documents organized by category, optionally within one collection.
+
+    Each category is fetched and streamed page by page. A database error
+    after streaming has started can only abort the response.
+    """
     supabase = db.get_client()
     
+    def build_query(file_type: DocumentType):
+        query = supabase.table("documents").select(LISTING_COLUMNS).eq("file_type", file_type.value)
+        if collection_id:
+            query = query.eq("collection_id", collection_id)
+        return query.order("upload_date", desc=True).order("id")
+    
     try:
-        print("Fetching documents by category...")
-        result = supabase.table("documents").select("id, filename, file_type, file_size, upload_date, metadata").order("upload_date", desc=True).execute()
-        
-        print(f"Database query result: {result}")
+        categories = {}
+        for file_type in DocumentType:
+            pages = _listing_pages(lambda file_type=file_type: build_query(file_type))
+            categories[file_type.value] = (next(pages), pages)
+    except Exception as e:
+        print(f"Unexpected error in get_documents_by_category: {str(e)}")
+        # Return empty categories instead of failing
+        return ORJSONResponse({"txt": [], "img": [], "pdf": []})
+    
+    if all(len(first_page) < LISTING_PAGE_SIZE for first_page, _ in categories.values()):
+        return ORJSONResponse({key: first_page for key, (first_page, _) in categories.items()})
+    return StreamingResponse(
+        stream_json_object(
+            (key, itertools.chain([first_page], pages)) for key, (first_page, pages) in categories.items()
+        ),
+        media_type="application/json"
+    )
+
+
+@router.get("/collections", response_model=List[CollectionSummary])
+async def get_collections():
+    """List collections with their document counts"""
+    supabase = db.get_client()
+    
+    try:
+        result = supabase.rpc("list_collections", {}).execute()
         
         if hasattr(result, 'error') and result.error:
-            print(f"Database error: {result.error}")
             raise HTTPException(status_code=500, detail=f"Database error: {result.error}")
         
-        # Initialize empty categories
-        categories = {"txt": [], "img": [], "pdf": []}
-        
-        # Handle empty result
-        if not hasattr(result, 'data') or not result.data:
-            print("No documents found in database")
-            return categories
-        
-        print(f"Found {len(result.data)} documents")
-        
-        for doc in result.data:
-            try:
-                doc_response = DocumentResponse(
-                    id=doc["id"],
-                    filename=doc["filename"],
-                    file_type=DocumentType(doc["file_type"]),
-                    file_size=doc["file_size"],
-                    upload_date=datetime.fromisoformat(doc["upload_date"].replace('Z', '+00:00')),
-                    metadata=doc["metadata"]
-                )
-                categories[doc["file_type"]].append(doc_response)
-            except Exception as doc_error:
-                print(f"Error processing document {doc.get('id', 'unknown')}: {doc_error}")
-                continue
-        
-        return categories
+        return [CollectionSummary(**row) for row in result.data]
         
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Unexpected error in get_documents_by_category: {str(e)}")
-        # Return empty categories instead of failing
-        return {"txt": [], "img": [], "pdf": []}
+        raise HTTPException(status_code=500, detail=f"Failed to fetch collections: {str(e)}")
 
 
 @router.get("/{document_id}", response_model=DocumentResponse)
@@ -171,23 +232,15 @@ async def get_document(document_id: str):
         raise HTTPException(status_code=400, detail="Invalid document ID format")
     
     try:
-        result = supabase.table("documents").select("id, filename, file_type, file_size, upload_date, metadata").eq("id", document_id).execute()
+        result = supabase.table("documents").select(LISTING_COLUMNS).eq("id", document_id).execute()
         
-        if result.error:
+        if hasattr(result, 'error') and result.error:
             raise HTTPException(status_code=500, detail=f"Database error: {result.error}")
         
         if not result.data:
             raise HTTPException(status_code=404, detail="Document not found")
         
-        doc = result.data[0]
-        return DocumentResponse(
-            id=doc["id"],
-            filename=doc["filename"],
-            file_type=DocumentType(doc["file_type"]),
-            file_size=doc["file_size"],
-            upload_date=datetime.fromisoformat(doc["upload_date"].replace('Z', '+00:00')),
-            metadata=doc["metadata"]
-        )
+        return ORJSONResponse(_listing_row(result.data[0]))
         
     except HTTPException:
         raise
@@ -195,9 +248,20 @@ async def get_document(document_id: str):
         raise HTTPException(status_code=500, detail=f"Failed to fetch document: {str(e)}")
 
 
+MAX_SPAN_LENGTH = 20000
+
+
 @router.get("/{document_id}/preview", response_model=DocumentPreview)
-async def get_document_preview(document_id: str):
-    """Get document preview with content"""
+async def get_document_preview(
+    document_id: str,
+    request: Request,
+    response: Response,
+    full: bool = Query(False, description="Return the full extracted text instead of the stored snippet"),
+    start: Optional[int] = Query(None, ge=0, description="Start of a cited span (character offset)"),
+    end: Optional[int] = Query(None, ge=0, description="End of a cited span (character offset)"),
+    context: int = Query(0, ge=0, le=2000, description="Extra characters around the span")
+):
+    """Get document preview: stored snippet and thumbnail, the full content, or only a cited span"""
     supabase = db.get_client()
     
     try:
@@ -206,37 +270,57 @@ async def get_document_preview(document_id: str):
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid document ID format")
     
+    if start is not None or end is not None:
+        if start is None or end is None or end <= start:
+            raise HTTPException(status_code=400, detail="Span previews need both start and end, with end > start")
+        if end - start > MAX_SPAN_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Spans are limited to {MAX_SPAN_LENGTH} characters")
+        return _get_span_preview(supabase, document_id, max(0, start - context), end + context)
+    
     try:
-        print(f"Fetching document preview for ID: {document_id}")
-        result = supabase.table("documents").select("*").eq("id", document_id).execute()
-        
-        print(f"Preview query result: {result}")
+        columns = PREVIEW_COLUMNS + ", content" if full else PREVIEW_COLUMNS
+        result = supabase.table("documents").select(columns).eq("id", document_id).execute()
         
         if hasattr(result, 'error') and result.error:
             print(f"Database error: {result.error}")
             raise HTTPException(status_code=500, detail=f"Database error: {result.error}")
         
         if not result.data:
-            print("Document not found")
             raise HTTPException(status_code=404, detail="Document not found")
         
         doc = result.data[0]
-        print(f"Document data: {doc}")
-        file_type = DocumentType(doc["file_type"])
         
+        # Rows only change through updated_at, so it versions every representation
+        etag = '"' + hashlib.sha1(f"{doc['id']}:{doc.get('updated_at')}:{int(full)}".encode()).hexdigest() + '"'
+        cache_headers = {
+            "ETag": etag,
+            "Cache-Control": f"private, max-age={settings.PREVIEW_CACHE_MAX_AGE_SECONDS}"
+        }
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=cache_headers)
+        response.headers.update(cache_headers)
+        
+        file_type = DocumentType(doc["file_type"])
         preview = DocumentPreview(
             id=doc["id"],
             filename=doc["filename"],
             file_type=file_type,
-            content=doc["content"] if file_type != DocumentType.IMG else None
+            file_url=storage_service.get_public_url(doc["file_path"]),
+            thumbnail_url=_thumbnail_url(doc)
         )
         
-        # For images, provide the file URL
-        if file_type == DocumentType.IMG:
-            print(f"Getting file URL for path: {doc['file_path']}")
-            preview.file_url = storage_service.get_file_url(doc["file_path"])
+        if file_type != DocumentType.IMG:
+            if full:
+                preview.content = doc["content"]
+            elif doc.get("preview_text") is not None:
+                preview.content = doc["preview_text"]
+                preview.content_truncated = bool(doc.get("preview_truncated"))
+            else:
+                # Rows imported before preview_text existed: slice the snippet in the database
+                span = _get_span_preview(supabase, document_id, 0, settings.PREVIEW_TEXT_LENGTH)
+                preview.content = span.content
+                preview.content_truncated = len(span.content or "") >= settings.PREVIEW_TEXT_LENGTH
         
-        print(f"Preview response: {preview}")
         return preview
         
     except HTTPException:
@@ -246,6 +330,37 @@ async def get_document_preview(document_id: str):
         raise HTTPException(status_code=500, detail=f"Failed to fetch document preview: {str(e)}")
 
 
+def _get_span_preview(supabase, document_id: str, span_start: int, span_end: int) -> DocumentPreview:
+    """Fetch only the requested slice of a document's text, sliced in the database"""
+    try:
+        result = supabase.rpc("get_document_span", {
+            "doc_id": document_id,
+            "span_start": span_start,
+            "span_end": span_end
+        }).execute()
+        
+        if hasattr(result, 'error') and result.error:
+            raise HTTPException(status_code=500, detail=f"Database error: {result.error}")
+        
+        if not result.data:
+            raise HTTPException(status_code=404, detail="Document not found")
+        
+        doc = result.data[0]
+        return DocumentPreview(
+            id=doc["id"],
+            filename=doc["filename"],
+            file_type=DocumentType(doc["file_type"]),
+            content=doc["content"],
+            span_start=span_start,
+            span_end=span_start + len(doc["content"] or "")
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch document span: {str(e)}")
+
+
 @router.delete("/{document_id}")
 async def delete_document(document_id: str):
     """Delete a document"""
@@ -259,7 +374,7 @@ async def delete_document(document_id: str):
     
     try:
         # Get document info first
-        result = supabase.table("documents").select("file_path").eq("id", document_id).execute()
+        result = supabase.table("documents").select("file_path, thumbnail_path").eq("id", document_id).execute()
         
         if result.error:
             raise HTTPException(status_code=500, detail=f"Database error: {result.error}")
@@ -278,6 +393,13 @@ async def delete_document(document_id: str):
         if db_result.error:
             raise HTTPException(status_code=500, detail=f"Database error: {db_result.error}")
         
+        # Thumbnails are keyed by content hash and may be shared with duplicate uploads
+        thumbnail_path = result.data[0].get("thumbnail_path")
+        if thumbnail_path:
+            still_used = supabase.table("documents").select("id").eq("thumbnail_path", thumbnail_path).limit(1).execute()
+            if not still_used.data:
+                storage_service.remove_files([thumbnail_path])
+        
         return {"message": "Document deleted successfully"}
         
     except HTTPException:
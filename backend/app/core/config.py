@@ -12,6 +12,20 @@ class Settings(BaseSettings):
     DEEPSEEK_API_KEY: str
     DEEPSEEK_BASE_URL: str = "https://api.deepseek.com/v1"
     
+    # LLM gateway
+    LLM_MODEL: str = "deepseek-chat"
+    LLM_TIMEOUT_SECONDS: float = 20.0  # Per attempt
+    LLM_CONNECT_TIMEOUT_SECONDS: float = 3.0
+    LLM_TOTAL_BUDGET_SECONDS: float = 30.0  # Across all attempts
+    LLM_MAX_RETRIES: int = 2
+    LLM_RETRY_BASE_DELAY: float = 0.25
+    LLM_RETRY_MAX_DELAY: float = 4.0
+    LLM_HEDGE_ENABLED: bool = True
+    LLM_HEDGE_PERCENTILE: float = 95.0  # Send a hedge once a call is slower than this
+    LLM_HEDGE_MIN_SAMPLES: int = 20
+    LLM_BREAKER_FAILURE_THRESHOLD: int = 5
+    LLM_BREAKER_RESET_SECONDS: float = 30.0
+    
     # App settings
     APP_NAME: str = "Knowledge Base QA"
     DEBUG: bool = False
@@ -20,6 +34,67 @@ class Settings(BaseSettings):
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
     ALLOWED_EXTENSIONS: list[str] = [".txt", ".pdf", ".jpg", ".jpeg", ".png"]
     
+    # Previews
+    PREVIEW_TEXT_LENGTH: int = 1000  # Characters stored in documents.preview_text
+    THUMBNAIL_SIZE: int = 256  # Longest edge in pixels
+    THUMBNAIL_QUALITY: int = 70  # WebP quality
+    PREVIEW_CACHE_MAX_AGE_SECONDS: int = 300
+    
+    # Retrieval and reranking
+    RETRIEVAL_CANDIDATES: int = 50  # Documents fetched before reranking
+    PASSAGE_SIZE: int = 800  # Characters per passage
+    PASSAGE_OVERLAP: int = 100
+    RERANK_TOP_K: int = 5  # Passages sent to the LLM
+    RERANK_BATCH_SIZE: int = 64
+    RERANK_LATENCY_BUDGET_MS: int = 150
+    RERANK_MAX_CANDIDATES: int = 300  # Passages kept for scoring after a cheap term-count prefilter
+    RERANK_LEXICAL_WEIGHT: float = 0.6  # Remainder goes to the semantic score
+    EMBEDDING_DIM: int = 256
+    EMBEDDING_MODEL: Optional[str] = None  # sentence-transformers model name, hashing embedder if unset
+    
+    # In-process search index
+    SEARCH_INDEX_ENABLED: bool = True  # Falls back to database search until the index is loaded
+    SEARCH_INDEX_DIR: str = ".index"  # Mount a persistent volume here to keep snapshots across restarts
+    SEARCH_INDEX_REFRESH_SECONDS: int = 60
+    SEARCH_INDEX_REPLAY_WINDOW_SECONDS: int = 300  # Replay overlap for rows committed after a later timestamp
+    SEARCH_INDEX_COMPACT_DELTA_DOCS: int = 500  # Write a new snapshot once this many documents changed
+    SEARCH_INDEX_SNAPSHOT_RETENTION_SECONDS: int = 600  # Superseded snapshots are kept this long for workers still mapping them
+    SEARCH_INDEX_MAX_COLLECTIONS: int = 8  # Collection indexes kept loaded; least recently used are evicted
+    
+    # Collections
+    DEFAULT_COLLECTION: str = "default"
+    
+    # Semantic answer cache
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_THRESHOLD: float = 0.9  # Cosine similarity required for a hit
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 1000
+    SEMANTIC_CACHE_TTL_SECONDS: int = 3600
+    # Serve a hit only if both questions have the same content words. Hashed
+    # embeddings score long questions differing in one key word above the
+    # threshold. Unset means on with the hashing embedder and off with a
+    # dense EMBEDDING_MODEL.
+    SEMANTIC_CACHE_REQUIRE_SAME_TERMS: Optional[bool] = None
+    SEMANTIC_CACHE_MIN_TERM_LENGTH: int = 3  # Shorter tokens ("s" from "what's") are not content words
+    
+    # Conversation sessions
+    SESSION_TTL_SECONDS: int = 1800
+    SESSION_MAX_SESSIONS: int = 10000
+    SESSION_HISTORY_TOKEN_BUDGET: int = 600  # History beyond this is summarized
+    SESSION_SUMMARY_TOKEN_BUDGET: int = 200
+    SESSION_PASSAGE_REUSE_THRESHOLD: float = 1.0  # Share of a follow-up's own content words the reused passages must contain
+    
+    # Admission control
+    ADMISSION_MAX_IN_FLIGHT: int = 8  # Concurrent retrieval + LLM computations
+    ADMISSION_MAX_QUEUE: int = 32
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 10.0
+    RATE_LIMIT_PER_CLIENT_PER_MINUTE: int = 30
+    RATE_LIMIT_BURST: int = 10
+    # Proxy addresses or CIDR ranges (e.g. "100.64.0.0/10") whose X-Forwarded-For
+    # identifies the client. Until the deployment's proxy is listed here every
+    # request appears to come from the proxy, so behind one (Railway's edge,
+    # a load balancer) the rate limit is effectively global, not per client.
+    TRUSTED_PROXIES: list[str] = []
+    
     class Config:
         env_file = ".env"
 
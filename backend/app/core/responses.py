@@ -0,0 +1,39 @@
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+import orjson
+from fastapi.responses import Response
+
+
+class ORJSONResponse(Response):
+    """JSON response rendered with orjson.
+
+    Handlers return plain dicts and lists that are already shaped like their
+    response model, so nothing is validated or converted again on the way out.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def stream_json_array(pages: Iterable[List[Dict[str, Any]]]) -> Iterator[bytes]:
+    """Encode pages of rows as one JSON array, one chunk per page"""
+    yield b"["
+    first = True
+    for page in pages:
+        if not page:
+            continue
+        # orjson encodes the whole page in one call; only its brackets are dropped
+        body = orjson.dumps(page)[1:-1]
+        yield body if first else b"," + body
+        first = False
+    yield b"]"
+
+
+def stream_json_object(fields: Iterable[Tuple[str, Iterable[List[Dict[str, Any]]]]]) -> Iterator[bytes]:
+    """Encode an object whose values are paged arrays, e.g. documents by category"""
+    yield b"{"
+    for i, (key, pages) in enumerate(fields):
+        yield (b"," if i else b"") + orjson.dumps(key) + b":"
+        yield from stream_json_array(pages)
+    yield b"}"
@@ -2,6 +2,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .api import documents, chat
 from .core.config import settings
+from .services.search_index import search_indexes
 
 app = FastAPI(
     title=settings.APP_NAME,
@@ -23,6 +24,13 @@ app.include_router(documents.router, prefix="/api/documents", tags=["documents"]
 app.include_router(chat.router, prefix="/api/chat", tags=["chat"])
 
 
+@app.on_event("startup")
+async def load_search_index():
+    """Map the default collection's snapshot in the background; other collections load on first query"""
+    if settings.SEARCH_INDEX_ENABLED:
+        search_indexes.get_ready(settings.DEFAULT_COLLECTION)
+
+
 @app.get("/")
 async def root():
     return {"message": "Knowledge Base QA API", "version": "1.0.0"}
@@ -4,6 +4,10 @@ from typing import Optional, Literal
 from enum import Enum
 
 
+# Collection ids double as snapshot directory names, so keep them path-safe
+COLLECTION_ID_PATTERN = r"^[a-z0-9][a-z0-9_-]{0,62}$"
+
+
 class DocumentType(str, Enum):
     TXT = "txt"
     IMG = "img"
@@ -14,6 +18,7 @@ class DocumentCreate(BaseModel):
     filename: str
     file_type: DocumentType
     file_size: int
+    collection_id: Optional[str] = None
     content: Optional[str] = None  # For text files and extracted PDF text
 
 
@@ -24,6 +29,7 @@ class DocumentInDB(BaseModel):
     file_path: str
     file_size: int
     upload_date: datetime
+    collection_id: str
     content: Optional[str] = None
     metadata: Optional[dict] = None
 
@@ -34,7 +40,14 @@ class DocumentResponse(BaseModel):
     file_type: DocumentType
     file_size: int
     upload_date: datetime
+    collection_id: Optional[str] = None
     metadata: Optional[dict] = None
+    thumbnail_url: Optional[str] = None
+
+
+class CollectionSummary(BaseModel):
+    collection_id: str
+    document_count: int
 
 
 class DocumentPreview(BaseModel):
@@ -42,4 +55,8 @@ class DocumentPreview(BaseModel):
     filename: str
     file_type: DocumentType
     content: Optional[str] = None
-    file_url: Optional[str] = None  # For images
\ No newline at end of file
+    content_truncated: bool = False  # True when content is only the stored snippet
+    file_url: Optional[str] = None  # Original file
+    thumbnail_url: Optional[str] = None
+    span_start: Optional[int] = None  # Set when only a cited span was requested
+    span_end: Optional[int] = None
\ No newline at end of file
@@ -0,0 +1,166 @@
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Awaitable, Callable, Tuple
+from ..core.config import settings
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed instead of queued"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1.0, retry_after)
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at ``rate`` tokens per second"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self) -> Tuple[bool, float]:
+        """Consume a token; otherwise return how long until one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True, 0.0
+        return False, (1.0 - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """Bounds concurrent answer computations and per-client request rates.
+
+    At most ``ADMISSION_MAX_IN_FLIGHT`` computations run at once and at most
+    ``ADMISSION_MAX_QUEUE`` wait behind them. Anything beyond that is
+    rejected immediately with a Retry-After estimate, so a spike sheds load
+    quickly instead of letting every request time out together.
+    """
+
+    MAX_TRACKED_CLIENTS = 10000
+
+    def __init__(self):
+        self.max_in_flight = settings.ADMISSION_MAX_IN_FLIGHT
+        self.max_queue = settings.ADMISSION_MAX_QUEUE
+        self.queue_timeout = settings.ADMISSION_QUEUE_TIMEOUT_SECONDS
+        self.rate = settings.RATE_LIMIT_PER_CLIENT_PER_MINUTE / 60.0
+        self.burst = settings.RATE_LIMIT_BURST
+
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._in_flight = 0
+        self._queued = 0
+        # Exponentially weighted service time, used for Retry-After estimates
+        self._service_time = 1.0
+
+        self.admitted = 0
+        self.rejected_rate_limited = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+
+    def check_rate(self, client_id: str):
+        """Apply the per-client token bucket"""
+        bucket = self._buckets.get(client_id)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst)
+            self._buckets[client_id] = bucket
+            if len(self._buckets) > self.MAX_TRACKED_CLIENTS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client_id)
+
+        allowed, wait = bucket.take()
+        if not allowed:
+            self.rejected_rate_limited += 1
+            raise AdmissionRejected("Rate limit exceeded", wait)
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one of the in-flight slots, waiting in the bounded queue if needed"""
+        # Waiters that have not acquired yet count against the queue
+        if self._in_flight + self._queued >= self.max_in_flight + self.max_queue:
+            self.rejected_queue_full += 1
+            raise AdmissionRejected("Server is busy", self._estimated_wait())
+
+        self._queued += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected_timeout += 1
+            raise AdmissionRejected("Timed out waiting for capacity", self._estimated_wait())
+        finally:
+            self._queued -= 1
+
+        self._in_flight += 1
+        self.admitted += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            self._semaphore.release()
+            self._service_time = 0.8 * self._service_time + 0.2 * (time.monotonic() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        """Current load and rejection counters"""
+        return {
+            "in_flight": self._in_flight,
+            "queued": self._queued,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected_rate_limited": self.rejected_rate_limited,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "avg_service_seconds": round(self._service_time, 3),
+        }
+
+    def _estimated_wait(self) -> float:
+        return self._service_time * (self._queued + 1) / self.max_in_flight
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one computation.
+
+    The first caller starts the computation as a task; callers arriving while
+    it runs await the same task. The task is shielded so a disconnecting
+    caller does not cancel the work other callers are waiting on.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Run ``fn`` once per key; returns the result and whether it was shared"""
+        task = self._calls.get(key)
+        shared = task is not None
+        if shared:
+            self.followers += 1
+        else:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+
+        return await asyncio.shield(task), shared
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Coalescing counters"""
+        return {"in_flight_keys": len(self._calls), "leaders": self.leaders, "followers": self.followers}
+
+
+admission_controller = AdmissionController()
+single_flight = SingleFlight()
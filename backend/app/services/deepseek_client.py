@@ -1,67 +1,101 @@
-from openai import OpenAI
-from typing import List, Dict, Any
-from ..core.config import settings
+import re
+from typing import List, Dict, Any, Optional
+from .embeddings import tokenize
+from .llm_gateway import llm_gateway, LLMUnavailable
 
 
 class DeepSeekClient:
     def __init__(self):
-        self.client = OpenAI(
-            api_key=settings.DEEPSEEK_API_KEY,
-            base_url=settings.DEEPSEEK_BASE_URL
-        )
+        self.gateway = llm_gateway
     
-    async def generate_answer(self, question: str, context_documents: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Generate answer using DeepSeek API with document context"""
+    async def generate_answer(self, question: str, passages: List[Dict[str, Any]], history: Optional[str] = None) -> Dict[str, Any]:
+        """Generate answer using DeepSeek API with reranked passages as context"""
         try:
-            # Prepare context from documents
-            context = self._prepare_context(context_documents)
+            # Prepare context from passages
+            context = self._prepare_context(passages)
             
             # Create prompt
-            prompt = self._create_prompt(question, context)
+            prompt = self._create_prompt(question, context, history)
             
-            # Call DeepSeek API
-            response = self.client.chat.completions.create(
-                model="deepseek-chat",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that answers questions based on provided documents. Keep your answers concise and always cite the documents you used."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=500,
-                temperature=0.1
-            )
+            # Call DeepSeek API through the gateway
+            try:
+                answer = await self.gateway.complete(
+                    [
+                        {"role": "system", "content": "You are a helpful assistant that answers questions based on provided documents. Keep your answers concise and always cite the passages you used."},
+                        {"role": "user", "content": prompt}
+                    ],
+                    max_tokens=500,
+                    temperature=0.1
+                )
+                degraded = False
+            except LLMUnavailable as e:
+                print(f"Falling back to extractive answer: {str(e)}")
+                answer = self._extractive_answer(question, passages)
+                degraded = True
             
-            answer = response.choices[0].message.content
-            used_documents = [doc["id"] for doc in context_documents]
+            cited_passages = self._parse_citations(answer, len(passages))
+            cited_documents = list(dict.fromkeys(passages[i]["document_id"] for i in cited_passages))
             
             return {
                 "answer": answer,
-                "cited_documents": used_documents,
-                "context_length": len(context)
+                "cited_documents": cited_documents,
+                "cited_passages": cited_passages,
+                "context_length": len(context),
+                "degraded": degraded
             }
             
         except Exception as e:
             raise Exception(f"DeepSeek API error: {str(e)}")
     
-    def _prepare_context(self, documents: List[Dict[str, Any]]) -> str:
-        """Prepare document context for the prompt"""
+    def _prepare_context(self, passages: List[Dict[str, Any]]) -> str:
+        """Prepare passage context for the prompt"""
         context_parts = []
         
-        for doc in documents:
-            if doc.get("content"):
-                context_parts.append(f"Document: {doc['filename']}\nContent: {doc['content'][:1000]}...")
+        for label, passage in enumerate(passages, 1):
+            if passage.get("text"):
+                page = f" (page {passage['page']})" if passage.get("page") else ""
+                context_parts.append(f"[{label}] Document: {passage['filename']}{page}\nContent: {passage['text']}")
         
         return "\n\n".join(context_parts)
     
-    def _create_prompt(self, question: str, context: str) -> str:
+    def _parse_citations(self, answer: str, passage_count: int) -> List[int]:
+        """Indices of the passages cited as [n] in the answer, all passages if none are"""
+        cited = []
+        for match in re.findall(r"\[(\d+)\]", answer or ""):
+            index = int(match) - 1
+            if 0 <= index < passage_count and index not in cited:
+                cited.append(index)
+        return cited or list(range(passage_count))
+    
+    def _extractive_answer(self, question: str, passages: List[Dict[str, Any]], max_sentences: int = 3) -> str:
+        """Answer built from the passage sentences that best overlap the question"""
+        query_terms = set(tokenize(question))
+        candidates = []
+        for rank, passage in enumerate(passages):
+            for sentence in re.split(r"(?<=[.!?])\s+", passage.get("text", "")):
+                overlap = len(query_terms.intersection(tokenize(sentence)))
+                if overlap:
+                    # Prefer higher-ranked passages when overlap ties
+                    candidates.append((overlap, -rank, sentence.strip()))
+        
+        if not candidates:
+            return "The answer service is temporarily unavailable. Please review the cited documents."
+        
+        candidates.sort(reverse=True)
+        lines = [f"- {sentence} [{1 - negative_rank}]" for _, negative_rank, sentence in candidates[:max_sentences]]
+        return "The answer service is temporarily unavailable. The most relevant excerpts are:\n" + "\n".join(lines)
+    
+    def _create_prompt(self, question: str, context: str, history: Optional[str] = None) -> str:
         """Create the prompt for DeepSeek API"""
-        return f"""Based on the following documents, please answer the question. Keep your answer concise and cite the documents you used.
+        conversation = f"\nConversation so far:\n{history}\n" if history else ""
+        return f"""Based on the following numbered passages, please answer the question. Keep your answer concise and cite the passages you used by their number in square brackets, for example [1].
 
-Documents:
+Passages:
 {context}
-
+{conversation}
 Question: {question}
 
-Please provide a short answer and list which documents you referenced."""
+Please provide a short answer and cite only the passages you actually used."""
 
 
 deepseek_client = DeepSeekClient()
\ No newline at end of file
@@ -1,8 +1,12 @@
 import PyPDF2
+import bisect
+import hashlib
 import io
+import pypdfium2
 import pytesseract
 from PIL import Image
-from typing import Optional
+from typing import Optional, List, Dict, Any, Tuple
+from ..core.config import settings
 from ..models.document import DocumentType
 
 
@@ -25,6 +29,23 @@ class DocumentProcessor:
             print(f"Error extracting text from {filename}: {str(e)}")
             return None
     
+    def extract_text_with_pages(self, content: bytes, file_type: DocumentType, filename: str) -> Tuple[Optional[str], Optional[List[int]]]:
+        """Extract text content plus the character offset where each PDF page starts"""
+        if file_type != DocumentType.PDF:
+            return self.extract_text_content(content, file_type, filename), None
+        
+        try:
+            pages = self._extract_pages_from_pdf(content)
+            page_offsets = []
+            position = 0
+            for page_text in pages:
+                page_offsets.append(position)
+                position += len(page_text) + 1  # Pages are joined with a newline
+            return '\n'.join(pages), page_offsets
+        except Exception as e:
+            print(f"Error extracting text from {filename}: {str(e)}")
+            return None, None
+    
     def _extract_text_from_txt(self, content: bytes) -> str:
         """Extract text from TXT file"""
         try:
@@ -38,6 +59,10 @@ class DocumentProcessor:
     
     def _extract_text_from_pdf(self, content: bytes) -> str:
         """Extract text from PDF file"""
+        return '\n'.join(self._extract_pages_from_pdf(content))
+    
+    def _extract_pages_from_pdf(self, content: bytes) -> List[str]:
+        """Extract text from each page of a PDF file"""
         try:
             pdf_file = io.BytesIO(content)
             pdf_reader = PyPDF2.PdfReader(pdf_file)
@@ -45,9 +70,9 @@ class DocumentProcessor:
             text_content = []
             for page_num in range(len(pdf_reader.pages)):
                 page = pdf_reader.pages[page_num]
-                text_content.append(page.extract_text())
+                text_content.append(page.extract_text() or "")
             
-            return '\n'.join(text_content)
+            return text_content
         except Exception as e:
             raise Exception(f"Failed to extract text from PDF: {str(e)}")
     
@@ -73,6 +98,90 @@ class DocumentProcessor:
             print(f"OCR failed for image: {str(e)}")
             return f"Image file - OCR processing failed: {str(e)}. Please install tesseract-ocr for text extraction from images."
     
+    def split_into_passages(
+        self,
+        text: str,
+        passage_size: Optional[int] = None,
+        overlap: Optional[int] = None,
+        page_offsets: Optional[List[int]] = None
+    ) -> List[Dict[str, Any]]:
+        """Split extracted text into overlapping passages with character offsets and page numbers"""
+        passage_size = passage_size or settings.PASSAGE_SIZE
+        overlap = settings.PASSAGE_OVERLAP if overlap is None else overlap
+        
+        passages = []
+        if not text:
+            return passages
+        
+        start = 0
+        length = len(text)
+        while start < length:
+            end = min(start + passage_size, length)
+            if end < length:
+                # Prefer to break on whitespace so words are not cut in half
+                boundary = text.rfind(" ", start + passage_size // 2, end)
+                if boundary != -1:
+                    end = boundary
+            
+            passage_text = text[start:end].strip()
+            if passage_text:
+                # Page numbers are 1-based; None for documents without pages
+                page = bisect.bisect_right(page_offsets, start) if page_offsets else None
+                passages.append({"start": start, "end": end, "page": page, "text": passage_text})
+            
+            if end >= length:
+                break
+            start = max(end - overlap, start + 1)
+        
+        return passages
+    
+    def create_preview_text(self, text: Optional[str]) -> Tuple[Optional[str], bool]:
+        """Short snippet of the extracted text, cut at a word boundary, and whether it was cut"""
+        if not text:
+            return None, False
+        limit = settings.PREVIEW_TEXT_LENGTH
+        if len(text) <= limit:
+            return text, False
+        cut = text.rfind(" ", 0, limit)
+        return text[:cut if cut > limit // 2 else limit].rstrip() + "...", True
+    
+    def create_thumbnail(self, content: bytes, file_type: DocumentType) -> Optional[bytes]:
+        """Downscaled WebP thumbnail for images and the first page of PDFs"""
+        try:
+            if file_type == DocumentType.IMG:
+                image = Image.open(io.BytesIO(content))
+                image.draft("RGB", (settings.THUMBNAIL_SIZE, settings.THUMBNAIL_SIZE))  # Fast JPEG downscale on decode
+            elif file_type == DocumentType.PDF:
+                image = self._render_pdf_first_page(content)
+            else:
+                return None
+            
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'A' in image.mode or image.mode == 'P' else 'RGB')
+            image.thumbnail((settings.THUMBNAIL_SIZE, settings.THUMBNAIL_SIZE))
+            
+            output = io.BytesIO()
+            image.save(output, format="WEBP", quality=settings.THUMBNAIL_QUALITY, method=4)
+            return output.getvalue()
+        except Exception as e:
+            print(f"Thumbnail generation failed: {str(e)}")
+            return None
+    
+    def _render_pdf_first_page(self, content: bytes) -> Image.Image:
+        """Render the first PDF page at roughly thumbnail resolution"""
+        pdf = pypdfium2.PdfDocument(content)
+        try:
+            page = pdf[0]
+            width, height = page.get_size()
+            scale = settings.THUMBNAIL_SIZE / max(width, height, 1)
+            return page.render(scale=max(scale, 0.1)).to_pil()
+        finally:
+            pdf.close()
+    
+    def compute_content_hash(self, content: bytes) -> str:
+        """SHA-256 of the raw file, used to skip duplicate uploads"""
+        return hashlib.sha256(content).hexdigest()
+    
     def get_document_metadata(self, content: bytes, file_type: DocumentType, filename: str) -> dict:
         """Extract metadata from document"""
         metadata = {
@@ -0,0 +1,103 @@
+import re
+import zlib
+import numpy as np
+from functools import lru_cache
+from typing import List, Tuple
+from ..core.config import settings
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by do does for from how i in is it its of on or "
+    "that the this to was what when where which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase text and split it into alphanumeric tokens, dropping stopwords"""
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+class HashingEmbedder:
+    """CPU-only text embedder based on feature hashing.
+
+    Each token contributes its word feature plus its character trigrams, so
+    inflections such as "refund" and "refunds" land close together. Hashing
+    uses crc32 rather than ``hash()`` so vectors are stable across processes.
+    """
+
+    def __init__(self, dim: int = None):
+        self.dim = dim or settings.EMBEDDING_DIM
+        self._features = lru_cache(maxsize=100_000)(self._token_features)
+
+    def _token_features(self, token: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Hashed feature indices and signs for a single token"""
+        padded = f"<{token}>"
+        grams = [token] + [padded[i:i + 3] for i in range(len(padded) - 2)]
+        hashes = np.array([zlib.crc32(gram.encode("utf-8")) for gram in grams], dtype=np.uint32)
+        indices = (hashes % self.dim).astype(np.intp)
+        signs = np.where((hashes >> 31) & 1, -1.0, 1.0).astype(np.float32)
+        # The whole-word feature carries more weight than any single trigram
+        signs[0] *= 2.0
+        return indices, signs
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch of texts into an L2-normalized float32 matrix"""
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            if not tokens:
+                continue
+            features = [self._features(token) for token in tokens]
+            indices = np.concatenate([f[0] for f in features])
+            signs = np.concatenate([f[1] for f in features])
+            np.add.at(matrix[row], indices, signs)
+
+        # Sublinear scaling keeps long passages from being dominated by repeats
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def embed_one(self, text: str) -> np.ndarray:
+        """Embed a single text into a 1-D normalized vector"""
+        return self.embed([text])[0]
+
+
+class SentenceTransformerEmbedder:
+    """Dense embedder backed by a local sentence-transformers model.
+
+    Captures paraphrases that share no vocabulary, at the cost of loading a
+    model on CPU. Only used when ``EMBEDDING_MODEL`` is configured.
+    """
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch of texts into an L2-normalized float32 matrix"""
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        vectors = self.model.encode(texts, batch_size=32, normalize_embeddings=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+    def embed_one(self, text: str) -> np.ndarray:
+        """Embed a single text into a 1-D normalized vector"""
+        return self.embed([text])[0]
+
+
+def _create_embedder():
+    """Use the configured dense model when available, hashing otherwise"""
+    if settings.EMBEDDING_MODEL:
+        try:
+            return SentenceTransformerEmbedder(settings.EMBEDDING_MODEL)
+        except Exception as e:
+            print(f"Failed to load embedding model {settings.EMBEDDING_MODEL}, using hashing embedder: {str(e)}")
+    return HashingEmbedder()
+
+
+embedder = _create_embedder()
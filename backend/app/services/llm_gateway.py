@@ -0,0 +1,209 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import List, Dict, Any, Optional
+import httpx
+import openai
+from openai import AsyncOpenAI
+from ..core.config import settings
+
+
+class LLMUnavailable(Exception):
+    """Raised when the upstream LLM cannot produce an answer in time"""
+
+
+class CircuitBreaker:
+    """Stops calling a failing upstream until a cool-down has passed.
+
+    After ``failure_threshold`` consecutive failures the breaker opens and
+    rejects calls for ``reset_seconds``. It then lets a single trial call
+    through (half-open); success closes it again, failure re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_started: Optional[float] = None
+
+    def allow_request(self) -> bool:
+        """Whether a call may be attempted right now"""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            # A trial abandoned by a cancelled caller must not wedge the breaker
+            now = time.monotonic()
+            if self._trial_started is None or now - self._trial_started >= self.reset_seconds:
+                self._trial_started = now
+                return True
+        return False
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._trial_started = None
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_started = None
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Sliding window of recent successful call latencies"""
+
+    def __init__(self, window: int = 200):
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+class LLMGateway:
+    """Resilient access to the OpenAI-compatible chat completions API.
+
+    Every attempt is bounded by a per-call timeout and the whole call by a
+    total budget. Retryable failures (timeouts, connection errors, 429 and
+    5xx) are retried with full-jitter exponential backoff. When a call runs
+    past the configured latency percentile a hedged second request is sent
+    and the first response wins. A circuit breaker short-circuits calls
+    while the upstream is failing so callers can degrade immediately.
+    """
+
+    def __init__(self):
+        self.client = AsyncOpenAI(
+            api_key=settings.DEEPSEEK_API_KEY,
+            base_url=settings.DEEPSEEK_BASE_URL,
+            timeout=httpx.Timeout(settings.LLM_TIMEOUT_SECONDS, connect=settings.LLM_CONNECT_TIMEOUT_SECONDS),
+            max_retries=0  # Retries are handled here, with jitter and a total budget
+        )
+        self.breaker = CircuitBreaker(settings.LLM_BREAKER_FAILURE_THRESHOLD, settings.LLM_BREAKER_RESET_SECONDS)
+        self.latencies = LatencyTracker()
+
+        self.calls = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failures = 0
+        self.short_circuited = 0
+
+    async def complete(self, messages: List[Dict[str, str]], **params) -> str:
+        """Return the completion text or raise LLMUnavailable"""
+        if not self.breaker.allow_request():
+            self.short_circuited += 1
+            raise LLMUnavailable("Circuit breaker is open")
+
+        self.calls += 1
+        deadline = time.monotonic() + settings.LLM_TOTAL_BUDGET_SECONDS
+        last_error: Optional[Exception] = None
+
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                content = await asyncio.wait_for(self._hedged_call(messages, params), timeout=remaining)
+                self.breaker.record_success()
+                return content
+            except Exception as e:
+                last_error = e
+                if not self._is_retryable(e) or attempt == settings.LLM_MAX_RETRIES:
+                    break
+                delay = random.uniform(0, min(settings.LLM_RETRY_MAX_DELAY, settings.LLM_RETRY_BASE_DELAY * 2 ** attempt))
+                if time.monotonic() + delay >= deadline:
+                    break
+                print(f"LLM call failed ({type(e).__name__}), retrying in {delay:.2f}s")
+                self.retries += 1
+                await asyncio.sleep(delay)
+
+        self.failures += 1
+        self.breaker.record_failure()
+        raise LLMUnavailable(f"LLM call failed: {type(last_error).__name__ if last_error else 'budget exhausted'}: {last_error}")
+
+    async def _hedged_call(self, messages: List[Dict[str, str]], params: Dict[str, Any]) -> str:
+        """Send the request, and a hedge if it is slower than usual"""
+        primary = asyncio.ensure_future(self._call(messages, params))
+        hedge_after = self._hedge_delay()
+        if hedge_after is None:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+        if done:
+            return primary.result()
+
+        self.hedges += 1
+        hedge = asyncio.ensure_future(self._call(messages, params))
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        return task.result()
+            # Both attempts failed; surface the primary's error
+            return primary.result()
+        finally:
+            for task in (primary, hedge):
+                if not task.done():
+                    task.cancel()
+
+    async def _call(self, messages: List[Dict[str, str]], params: Dict[str, Any]) -> str:
+        started = time.monotonic()
+        response = await self.client.chat.completions.create(
+            model=settings.LLM_MODEL,
+            messages=messages,
+            **params
+        )
+        self.latencies.record(time.monotonic() - started)
+        return response.choices[0].message.content
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not settings.LLM_HEDGE_ENABLED or len(self.latencies.samples) < settings.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return self.latencies.percentile(settings.LLM_HEDGE_PERCENTILE)
+
+    def _is_retryable(self, error: Exception) -> bool:
+        if isinstance(error, (asyncio.TimeoutError, openai.APIConnectionError)):
+            return True
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code in (408, 409, 429) or error.status_code >= 500
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        """Call, retry, hedge and breaker counters"""
+        p50 = self.latencies.percentile(50)
+        p99 = self.latencies.percentile(99)
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "failures": self.failures,
+            "short_circuited": self.short_circuited,
+            "breaker_state": self.breaker.state,
+            "latency_p50_seconds": round(p50, 3) if p50 is not None else None,
+            "latency_p99_seconds": round(p99, 3) if p99 is not None else None,
+        }
+
+
+llm_gateway = LLMGateway()
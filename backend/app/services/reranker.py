@@ -0,0 +1,138 @@
+import time
+import numpy as np
+from typing import List, Dict, Any, Optional, Tuple
+from ..core.config import settings
+from .embeddings import embedder, tokenize
+
+
+class Reranker:
+    """Second retrieval stage: scores candidate passages against the question.
+
+    Scoring fuses BM25 computed over the candidate set with cosine similarity
+    of hashed embeddings. Large candidate sets are first cut down to
+    ``RERANK_MAX_CANDIDATES`` by counting query-term occurrences. Both stages
+    check the latency budget as they go: passages the lexical stage did not
+    reach score zero, and passages the semantic stage did not reach keep only
+    their lexical score.
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self):
+        self.batch_size = settings.RERANK_BATCH_SIZE
+        self.lexical_weight = settings.RERANK_LEXICAL_WEIGHT
+        self.max_candidates = settings.RERANK_MAX_CANDIDATES
+
+    def rerank(
+        self,
+        question: str,
+        passages: List[Dict[str, Any]],
+        top_k: Optional[int] = None,
+        budget_ms: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Rerank passages and return the best ``top_k`` with their scores"""
+        top_k = top_k or settings.RERANK_TOP_K
+        budget_ms = settings.RERANK_LATENCY_BUDGET_MS if budget_ms is None else budget_ms
+        started = time.perf_counter()
+        deadline = started + budget_ms / 1000.0
+
+        stats = {"candidates": len(passages), "scored": 0, "budget_exhausted": False}
+        if not passages:
+            stats["elapsed_ms"] = 0.0
+            return {"passages": [], "stats": stats}
+
+        query_terms = list(dict.fromkeys(tokenize(question)))
+        if len(passages) > self.max_candidates:
+            passages = self._prefilter(query_terms, passages)
+            stats["prefiltered_to"] = len(passages)
+
+        lexical, lexical_complete = self._lexical_scores(query_terms, passages, deadline)
+        if not lexical_complete:
+            stats["budget_exhausted"] = True
+
+        # Semantic scoring is the costlier stage; visit passages in lexical
+        # order so an exhausted budget only drops the weakest candidates.
+        order = np.argsort(-lexical, kind="stable")
+        semantic = np.zeros(len(passages), dtype=np.float32)
+        query_vector = embedder.embed_one(question)
+        scored = 0
+        for batch_start in range(0, len(order), self.batch_size):
+            if time.perf_counter() > deadline:
+                stats["budget_exhausted"] = True
+                break
+            batch = order[batch_start:batch_start + self.batch_size]
+            vectors = self._passage_vectors([passages[i] for i in batch])
+            semantic[batch] = np.clip(vectors @ query_vector, 0.0, 1.0)
+            scored += len(batch)
+
+        fused = self.lexical_weight * lexical + (1.0 - self.lexical_weight) * semantic
+        ranked = np.argsort(-fused, kind="stable")[:top_k]
+
+        results = []
+        for i in ranked:
+            passage = dict(passages[i])
+            passage["score"] = round(float(fused[i]), 4)
+            passage["lexical_score"] = round(float(lexical[i]), 4)
+            passage["semantic_score"] = round(float(semantic[i]), 4)
+            results.append(passage)
+
+        stats["scored"] = scored
+        stats["elapsed_ms"] = round((time.perf_counter() - started) * 1000.0, 2)
+        return {"passages": results, "stats": stats}
+
+    def _passage_vectors(self, passages: List[Dict[str, Any]]) -> np.ndarray:
+        """Stored index vectors where available, embedding the rest on the fly"""
+        missing = [i for i, passage in enumerate(passages) if passage.get("vector") is None]
+        if len(missing) == len(passages):
+            return embedder.embed([passage["text"] for passage in passages])
+
+        vectors = np.zeros((len(passages), embedder.dim), dtype=np.float32)
+        for i, passage in enumerate(passages):
+            if passage.get("vector") is not None:
+                vectors[i] = passage["vector"]
+        if missing:
+            vectors[missing] = embedder.embed([passages[i]["text"] for i in missing])
+        return vectors
+
+    def _prefilter(self, query_terms: List[str], passages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Keep the passages with the most raw query-term occurrences, in their original order"""
+        counts = np.array(
+            [sum(text.count(term) for term in query_terms) for text in (p["text"].lower() for p in passages)],
+            dtype=np.int32
+        )
+        keep = np.sort(np.argsort(-counts, kind="stable")[:self.max_candidates])
+        return [passages[i] for i in keep]
+
+    def _lexical_scores(self, query_terms: List[str], passages: List[Dict[str, Any]], deadline: float) -> Tuple[np.ndarray, bool]:
+        """BM25 over the candidate set, normalized to [0, 1], and whether every passage was scored"""
+        if not query_terms:
+            return np.zeros(len(passages), dtype=np.float32), True
+
+        term_index = {term: i for i, term in enumerate(query_terms)}
+        tf = np.zeros((len(passages), len(query_terms)), dtype=np.float32)
+        lengths = np.zeros(len(passages), dtype=np.float32)
+        scanned = len(passages)
+        for row, passage in enumerate(passages):
+            if row % self.batch_size == 0 and row and time.perf_counter() > deadline:
+                scanned = row
+                break
+            tokens = tokenize(passage["text"])
+            lengths[row] = len(tokens)
+            for token in tokens:
+                col = term_index.get(token)
+                if col is not None:
+                    tf[row, col] += 1.0
+
+        n = scanned
+        df = np.count_nonzero(tf, axis=0).astype(np.float32)
+        idf = np.log1p((n - df + 0.5) / (df + 0.5))
+        avg_length = max(float(lengths[:scanned].mean()), 1.0)
+        norm = self.K1 * (1.0 - self.B + self.B * lengths / avg_length)
+        scores = ((tf * (self.K1 + 1.0)) / (tf + norm[:, None])) @ idf
+
+        top = float(scores.max())
+        return (scores / top if top > 0 else scores), scanned == len(passages)
+
+
+reranker = Reranker()
@@ -0,0 +1,743 @@
+import json
+import os
+import shutil
+import threading
+import time
+import numpy as np
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Iterable, Iterator
+from ..core.config import settings
+from ..core.database import db
+from .document_processor import document_processor
+from .embeddings import embedder, tokenize
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; snapshot writes are then unserialized
+    fcntl = None
+
+
+SNAPSHOT_VERSION = 2
+PAGE_SIZE = 1000
+ID_BATCH_SIZE = 100
+ROW_COLUMNS = "id, filename, file_type, content, updated_at, page_offsets"
+
+_ARRAYS = (
+    "term_blob", "term_offsets",
+    "postings_offsets", "postings_passages", "postings_tf",
+    "passage_doc", "passage_start", "passage_end", "passage_page", "passage_length",
+    "passage_text_blob", "passage_text_offsets",
+    "doc_ids", "doc_updated_at", "doc_file_types",
+    "doc_filename_blob", "doc_filename_offsets",
+    "vectors",
+)
+
+
+def _pack_strings(values: List[str]):
+    """Encode strings as one UTF-8 blob plus an offsets array"""
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    if encoded:
+        offsets[1:] = np.cumsum([len(value) for value in encoded])
+    blob = np.frombuffer(b"".join(encoded), dtype=np.uint8) if encoded else np.zeros(0, dtype=np.uint8)
+    return blob, offsets
+
+
+class _StringTable:
+    """Read-only view over a packed string blob, usually memory-mapped"""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        return bytes(self.blob[self.offsets[index]:self.offsets[index + 1]]).decode("utf-8")
+
+    def find(self, value: str) -> int:
+        """Binary search in a sorted table; -1 when absent"""
+        target = value.encode("utf-8")
+        low, high = 0, len(self)
+        while low < high:
+            mid = (low + high) // 2
+            current = bytes(self.blob[self.offsets[mid]:self.offsets[mid + 1]])
+            if current < target:
+                low = mid + 1
+            elif current > target:
+                high = mid
+            else:
+                return mid
+        return -1
+
+
+class _IndexState:
+    """Immutable view used by searches; refreshes swap in a new one"""
+
+    def __init__(self, base: Optional[Dict[str, np.ndarray]], header: Dict[str, Any]):
+        self.base = base
+        self.header = header
+        self.terms = _StringTable(base["term_blob"], base["term_offsets"]) if base else None
+        self.base_doc_index: Dict[str, int] = {}
+        if base:
+            for i, doc_id in enumerate(base["doc_ids"]):
+                self.base_doc_index[doc_id.decode("ascii")] = i
+        self.dead_docs = np.zeros(len(self.base_doc_index), dtype=bool)
+        self.dead_passages = np.zeros(len(base["passage_doc"]) if base else 0, dtype=bool)
+
+        # Documents changed since the snapshot, held in plain Python structures
+        self.delta_docs: Dict[str, Dict[str, Any]] = {}
+        self.delta_passages: List[Dict[str, Any]] = []
+        self.delta_postings: Dict[str, List[tuple]] = {}
+        self.delta_tokens = 0
+        self.replayed_to: Optional[str] = header["watermark"]
+
+    def clone(self) -> "_IndexState":
+        state = _IndexState.__new__(_IndexState)
+        state.base = self.base
+        state.header = self.header
+        state.terms = self.terms
+        state.base_doc_index = self.base_doc_index
+        state.dead_docs = self.dead_docs.copy()
+        state.dead_passages = self.dead_passages
+        state.delta_docs = dict(self.delta_docs)
+        state.delta_passages = []
+        state.delta_postings = {}
+        state.delta_tokens = 0
+        state.replayed_to = self.replayed_to
+        return state
+
+    def rebuild_delta(self):
+        """Recompute delta postings and the tombstone mask after a change"""
+        self.delta_passages = []
+        self.delta_postings = {}
+        self.delta_tokens = 0
+        for record in self.delta_docs.values():
+            for passage in record["passages"]:
+                pid = len(self.delta_passages)
+                counts = Counter(tokenize(passage["text"]))
+                passage["length"] = sum(counts.values())
+                self.delta_tokens += passage["length"]
+                self.delta_passages.append({**record["meta"], **passage})
+                for term, tf in counts.items():
+                    self.delta_postings.setdefault(term, []).append((pid, tf))
+
+        if self.base:
+            self.dead_passages = self.dead_docs[self.base["passage_doc"]]
+
+    @property
+    def base_passage_count(self) -> int:
+        return len(self.dead_passages)
+
+    @property
+    def live_document_count(self) -> int:
+        # A changed base document is tombstoned and counted once, in the delta
+        return int(len(self.base_doc_index) - self.dead_docs.sum()) + len(self.delta_docs)
+
+    def is_current(self, row: Dict[str, Any]) -> bool:
+        """True when this version of the row is already indexed"""
+        existing = self.delta_docs.get(row["id"])
+        if existing:
+            return existing["meta"]["updated_at"] == row["updated_at"]
+        base_index = self.base_doc_index.get(row["id"])
+        if base_index is None or self.dead_docs[base_index]:
+            return False
+        return (self.base["doc_updated_at"][base_index].decode("ascii") or None) == row["updated_at"]
+
+    @property
+    def live_passage_count(self) -> int:
+        return int(self.base_passage_count - self.dead_passages.sum()) + len(self.delta_passages)
+
+
+class SearchIndex:
+    """In-process BM25 passage index backed by memory-mapped snapshots.
+
+    A snapshot is a directory of ``.npy`` arrays (postings, passage offsets
+    and text, document metadata and embedding vectors) plus a versioned
+    ``header.json``. Workers load it with ``mmap_mode="r"`` so every process
+    shares the same page-cache pages, then replay only documents whose
+    ``updated_at`` is at or after the snapshot watermark into a small
+    in-memory delta. Startup cost therefore depends on the change volume
+    since the last snapshot rather than on corpus size.
+
+    Each index covers one collection and keeps its snapshots in a
+    subdirectory named after it. Snapshots are only written under an
+    exclusive lock on that directory, so one worker compacts while the
+    others notice the new ``CURRENT`` on their next refresh and remap it,
+    keeping every worker on the same shared pages.
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, collection_id: Optional[str] = None, directory: Optional[str] = None):
+        self.collection_id = collection_id or settings.DEFAULT_COLLECTION
+        self.directory = directory or os.path.join(settings.SEARCH_INDEX_DIR, self.collection_id)
+        self.supabase = db.get_client()
+        self.ready = False
+        self.loading = False
+        self.last_load_attempt = 0.0
+        self._state = _IndexState(None, self._new_header(None))
+        self._refresh_lock = threading.Lock()
+        self._last_refresh = 0.0
+
+    def load_or_build(self):
+        """Load the newest snapshot, building one from the database if needed"""
+        started = time.perf_counter()
+        try:
+            state = self._load_snapshot()
+            if state is None:
+                # Wait for a worker that is already building, then use its snapshot
+                with self._snapshot_lock(blocking=True):
+                    state = self._load_snapshot()
+                    if state is None:
+                        print(f"No usable index snapshot for collection {self.collection_id}, building from database")
+                        self._write_snapshot(self._records_from_database(), self._max_watermark_in_database())
+                        state = self._load_snapshot()
+            self._state = state
+            self.refresh(force=True)
+            self.ready = True
+            print(f"Search index for {self.collection_id} ready with {self._state.live_passage_count} passages "
+                  f"in {time.perf_counter() - started:.2f}s")
+        except Exception as e:
+            print(f"Search index unavailable, using database search: {str(e)}")
+
+    def maybe_refresh(self):
+        """Start a background refresh if the refresh interval has elapsed.
+
+        Searches never wait for it; they keep using the current state until
+        the refreshed one is swapped in.
+        """
+        if time.monotonic() - self._last_refresh < settings.SEARCH_INDEX_REFRESH_SECONDS or self._refresh_lock.locked():
+            return
+        self._last_refresh = time.monotonic()
+        threading.Thread(target=self.refresh, name=f"search-index-refresh-{self.collection_id}", daemon=True).start()
+
+    def refresh(self, force: bool = False):
+        """Apply documents changed or deleted since the snapshot watermark.
+
+        ``updated_at`` is set by writers before they commit, so a row can
+        become visible after a later timestamp was already replayed. Replay
+        therefore overlaps the previous watermark by a safety window, and a
+        document count that disagrees with the index triggers a full id
+        reconciliation, which also catches deletions. A snapshot written by
+        another worker is remapped first.
+        """
+        if not self._refresh_lock.acquire(blocking=force):
+            return  # Another thread is already refreshing
+        try:
+            self._last_refresh = time.monotonic()
+            state = self._remap_if_replaced(self._state) or self._state.clone()
+
+            changed = 0
+            for row in self._fetch_rows(self._replay_from(state.replayed_to)):
+                if state.is_current(row):
+                    continue  # Already indexed, e.g. replayed again inside the window
+                changed += self._apply_row(state, row)
+
+            if self._count_documents() != state.live_document_count:
+                changed += self._reconcile_ids(state)
+
+            state.rebuild_delta()
+            self._state = state
+            if changed:
+                print(f"Search index replayed {changed} changed documents")
+
+            if len(state.delta_docs) > settings.SEARCH_INDEX_COMPACT_DELTA_DOCS:
+                self.compact(blocking=False)
+        except Exception as e:
+            print(f"Search index refresh error: {str(e)}")
+        finally:
+            self._refresh_lock.release()
+
+    def _apply_row(self, state: _IndexState, row: Dict[str, Any]) -> int:
+        base_index = state.base_doc_index.get(row["id"])
+        if base_index is not None:
+            state.dead_docs[base_index] = True
+        state.delta_docs[row["id"]] = self._build_record(row)
+        state.replayed_to = max(state.replayed_to or "", row["updated_at"] or "") or None
+        return 1
+
+    def _reconcile_ids(self, state: _IndexState) -> int:
+        """Drop deleted documents and index live ones the replay never saw"""
+        live_ids = set(self._fetch_ids())
+        for doc_id, base_index in state.base_doc_index.items():
+            if doc_id not in live_ids:
+                state.dead_docs[base_index] = True
+        for doc_id in [doc_id for doc_id in state.delta_docs if doc_id not in live_ids]:
+            del state.delta_docs[doc_id]
+
+        indexed = set(state.delta_docs)
+        indexed.update(doc_id for doc_id, base_index in state.base_doc_index.items() if not state.dead_docs[base_index])
+        missing = [doc_id for doc_id in live_ids if doc_id not in indexed]
+        changed = 0
+        for row in self._fetch_rows_by_id(missing):
+            changed += self._apply_row(state, row)
+        if missing:
+            print(f"Search index found {len(missing)} documents missed by replay")
+        return changed
+
+    def _replay_from(self, watermark: Optional[str]) -> Optional[str]:
+        if not watermark:
+            return None
+        try:
+            replay_from = datetime.fromisoformat(watermark.replace("Z", "+00:00"))
+        except ValueError:
+            return watermark
+        return (replay_from - timedelta(seconds=settings.SEARCH_INDEX_REPLAY_WINDOW_SECONDS)).isoformat()
+
+    def compact(self, blocking: bool = True) -> bool:
+        """Fold the delta into a new snapshot and remap it.
+
+        Without ``blocking``, gives up when another process holds the
+        snapshot lock; that process's snapshot is picked up on a later
+        refresh instead. Returns whether this index now maps a new snapshot.
+        """
+        with self._snapshot_lock(blocking) as acquired:
+            if not acquired:
+                return False
+            state = self._state
+            # Another worker may have compacted since this one last refreshed
+            replaced = self._remap_if_replaced(state)
+            if replaced is not None:
+                self._state = replaced
+                return True
+
+            watermark = max(
+                [state.header["watermark"] or ""] + [record["meta"]["updated_at"] or "" for record in state.delta_docs.values()]
+            ) or None
+            self._write_snapshot(self._live_records(state), watermark)
+            self._state = self._carry_delta(state, self._load_snapshot())
+            return True
+
+    def _remap_if_replaced(self, state: _IndexState) -> Optional[_IndexState]:
+        """The snapshot CURRENT now points at, if it is not the one this state maps"""
+        if self._current_snapshot_name() in (None, state.header.get("name")):
+            return None
+        new_state = self._load_snapshot()
+        if new_state is None:
+            return None
+        print(f"Search index for {self.collection_id} remapped snapshot {new_state.header['name']}")
+        return self._carry_delta(state, new_state)
+
+    def _carry_delta(self, state: _IndexState, new_state: _IndexState) -> _IndexState:
+        """Keep delta documents newer than the new snapshot's watermark"""
+        watermark = new_state.header["watermark"] or ""
+        new_state.delta_docs = {
+            doc_id: record for doc_id, record in state.delta_docs.items()
+            if (record["meta"]["updated_at"] or "") > watermark
+        }
+        for doc_id in new_state.delta_docs:
+            base_index = new_state.base_doc_index.get(doc_id)
+            if base_index is not None:
+                new_state.dead_docs[base_index] = True
+        new_state.rebuild_delta()
+        return new_state
+
+    @contextmanager
+    def _snapshot_lock(self, blocking: bool):
+        """Exclusive lock on the collection's snapshot directory, across processes"""
+        if fcntl is None:
+            yield True
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, ".lock"), "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def search(self, query: str, limit: int) -> List[Dict[str, Any]]:
+        """Top passages by BM25, with their stored embedding vectors"""
+        state = self._state
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or state.live_passage_count == 0:
+            return []
+
+        # Postings still include tombstoned passages, so N must count them too;
+        # otherwise df can exceed N and terms common to every passage score negative
+        base = state.base
+        total = state.base_passage_count + len(state.delta_passages)
+        base_tokens = state.header["total_tokens"]
+        avg_length = max((base_tokens + state.delta_tokens) / max(total, 1), 1.0)
+
+        base_scores = np.zeros(state.base_passage_count, dtype=np.float32)
+        delta_scores = np.zeros(len(state.delta_passages), dtype=np.float32)
+        for term in terms:
+            term_id = state.terms.find(term) if state.terms is not None else -1
+            delta_postings = state.delta_postings.get(term, [])
+            if term_id < 0 and not delta_postings:
+                continue
+
+            start = end = 0
+            if term_id >= 0:
+                start, end = int(base["postings_offsets"][term_id]), int(base["postings_offsets"][term_id + 1])
+            df = (end - start) + len(delta_postings)
+            idf = np.log1p((total - df + 0.5) / (df + 0.5))
+
+            if end > start:
+                pids = base["postings_passages"][start:end]
+                tf = base["postings_tf"][start:end].astype(np.float32)
+                lengths = base["passage_length"][pids].astype(np.float32)
+                weights = idf * tf * (self.K1 + 1.0) / (tf + self.K1 * (1.0 - self.B + self.B * lengths / avg_length))
+                base_scores += np.bincount(pids, weights=weights, minlength=len(base_scores)).astype(np.float32)
+
+            for pid, tf in delta_postings:
+                length = state.delta_passages[pid]["length"]
+                delta_scores[pid] += idf * tf * (self.K1 + 1.0) / (tf + self.K1 * (1.0 - self.B + self.B * length / avg_length))
+
+        base_scores[state.dead_passages] = 0.0
+        candidates = [(float(base_scores[i]), "base", int(i)) for i in self._top_indices(base_scores, limit)]
+        candidates += [(float(delta_scores[i]), "delta", int(i)) for i in self._top_indices(delta_scores, limit)]
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+
+        results = []
+        for score, source, index in candidates[:limit]:
+            passage = self._base_passage(state, index) if source == "base" else dict(state.delta_passages[index])
+            passage.pop("length", None)
+            passage["retrieval_score"] = round(score, 4)
+            results.append(passage)
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot and delta sizes"""
+        state = self._state
+        return {
+            "collection_id": self.collection_id,
+            "ready": self.ready,
+            "snapshot": state.header.get("name"),
+            "watermark": state.header["watermark"],
+            "base_passages": state.base_passage_count,
+            "deleted_base_documents": int(state.dead_docs.sum()),
+            "delta_documents": len(state.delta_docs),
+            "live_passages": state.live_passage_count,
+        }
+
+    def _top_indices(self, scores: np.ndarray, limit: int) -> np.ndarray:
+        positive = np.flatnonzero(scores > 0)
+        if len(positive) > limit:
+            positive = positive[np.argpartition(-scores[positive], limit)[:limit]]
+        return positive
+
+    def _base_passage(self, state: _IndexState, index: int) -> Dict[str, Any]:
+        base = state.base
+        doc = int(base["passage_doc"][index])
+        return {
+            "document_id": base["doc_ids"][doc].decode("ascii"),
+            "filename": _StringTable(base["doc_filename_blob"], base["doc_filename_offsets"])[doc],
+            "file_type": base["doc_file_types"][doc].decode("ascii"),
+            "updated_at": base["doc_updated_at"][doc].decode("ascii") or None,
+            "start": int(base["passage_start"][index]),
+            "end": int(base["passage_end"][index]),
+            "page": int(base["passage_page"][index]) or None,
+            "text": _StringTable(base["passage_text_blob"], base["passage_text_offsets"])[index],
+            "vector": np.array(base["vectors"][index]),
+        }
+
+    def _build_record(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Passages and vectors for one document row"""
+        passages = document_processor.split_into_passages(row.get("content") or "", page_offsets=row.get("page_offsets"))
+        vectors = embedder.embed([passage["text"] for passage in passages])
+        for passage, vector in zip(passages, vectors):
+            passage["vector"] = vector
+        return {
+            "meta": {
+                "document_id": row["id"],
+                "filename": row["filename"],
+                "file_type": row["file_type"],
+                "updated_at": row.get("updated_at"),
+            },
+            "passages": passages,
+        }
+
+    def _live_records(self, state: _IndexState) -> Iterator[Dict[str, Any]]:
+        """Every live document, reusing stored vectors for snapshot documents"""
+        base = state.base
+        if base:
+            # Passages are written document by document, so passage_doc is sorted
+            passage_doc = base["passage_doc"]
+            for doc_id, doc in state.base_doc_index.items():
+                if state.dead_docs[doc] or doc_id in state.delta_docs:
+                    continue
+                start, end = np.searchsorted(passage_doc, [doc, doc + 1])
+                passages = [self._base_passage(state, i) for i in range(int(start), int(end))]
+                if passages:
+                    meta = {key: passages[0][key] for key in ("document_id", "filename", "file_type", "updated_at")}
+                    yield {"meta": meta, "passages": passages}
+        yield from state.delta_docs.values()
+
+    def _records_from_database(self) -> Iterator[Dict[str, Any]]:
+        for row in self._fetch_rows(None):
+            yield self._build_record(row)
+
+    def _fetch_rows(self, since: Optional[str]) -> Iterator[Dict[str, Any]]:
+        """Page through documents, optionally only those updated since a watermark"""
+        offset = 0
+        while True:
+            query = self.supabase.table("documents").select(ROW_COLUMNS).eq("collection_id", self.collection_id)
+            if since:
+                query = query.gte("updated_at", since)
+            result = query.order("updated_at").order("id").range(offset, offset + PAGE_SIZE - 1).execute()
+            yield from result.data
+            if len(result.data) < PAGE_SIZE:
+                return
+            offset += PAGE_SIZE
+
+    def _fetch_rows_by_id(self, doc_ids: List[str]) -> Iterator[Dict[str, Any]]:
+        for start in range(0, len(doc_ids), ID_BATCH_SIZE):
+            result = self.supabase.table("documents").select(ROW_COLUMNS).in_(
+                "id", doc_ids[start:start + ID_BATCH_SIZE]
+            ).execute()
+            yield from result.data
+
+    def _count_documents(self) -> int:
+        result = self.supabase.table("documents").select("id", count="exact").eq(
+            "collection_id", self.collection_id
+        ).limit(1).execute()
+        return result.count
+
+    def _fetch_ids(self) -> Iterator[str]:
+        offset = 0
+        while True:
+            result = self.supabase.table("documents").select("id").eq(
+                "collection_id", self.collection_id
+            ).order("id").range(offset, offset + PAGE_SIZE - 1).execute()
+            for row in result.data:
+                yield row["id"]
+            if len(result.data) < PAGE_SIZE:
+                return
+            offset += PAGE_SIZE
+
+    def _max_watermark_in_database(self) -> Optional[str]:
+        # Read before building so rows updated during the build are replayed
+        result = self.supabase.table("documents").select("updated_at").eq(
+            "collection_id", self.collection_id
+        ).order("updated_at", desc=True).limit(1).execute()
+        return result.data[0]["updated_at"] if result.data else None
+
+    def _new_header(self, watermark: Optional[str]) -> Dict[str, Any]:
+        return {
+            "version": SNAPSHOT_VERSION,
+            "watermark": watermark,
+            "embedder": type(embedder).__name__,
+            "embedding_model": settings.EMBEDDING_MODEL,
+            "embedding_dim": embedder.dim,
+            "passage_size": settings.PASSAGE_SIZE,
+            "total_tokens": 0,
+        }
+
+    def _write_snapshot(self, records: Iterable[Dict[str, Any]], watermark: Optional[str]):
+        """Serialize records into a new snapshot directory and point CURRENT at it"""
+        doc_ids, doc_updated, doc_types, doc_names = [], [], [], []
+        passage_doc, passage_start, passage_end, passage_page = [], [], [], []
+        passage_length, passage_texts, vectors = [], [], []
+        postings: Dict[str, List[tuple]] = {}
+
+        for record in records:
+            doc = len(doc_ids)
+            meta = record["meta"]
+            doc_ids.append(meta["document_id"])
+            doc_updated.append(meta["updated_at"] or "")
+            doc_types.append(meta["file_type"])
+            doc_names.append(meta["filename"])
+            for passage in record["passages"]:
+                pid = len(passage_doc)
+                counts = Counter(tokenize(passage["text"]))
+                passage_doc.append(doc)
+                passage_start.append(passage["start"])
+                passage_end.append(passage["end"])
+                passage_page.append(passage.get("page") or 0)
+                passage_length.append(sum(counts.values()))
+                passage_texts.append(passage["text"])
+                vectors.append(passage["vector"])
+                for term, tf in counts.items():
+                    postings.setdefault(term, []).append((pid, tf))
+
+        terms = sorted(postings, key=lambda term: term.encode("utf-8"))
+        postings_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        postings_offsets[1:] = np.cumsum([len(postings[term]) for term in terms]) if terms else []
+        flat = [entry for term in terms for entry in postings[term]]
+
+        arrays = {}
+        arrays["term_blob"], arrays["term_offsets"] = _pack_strings(terms)
+        arrays["postings_offsets"] = postings_offsets
+        arrays["postings_passages"] = np.array([pid for pid, _ in flat], dtype=np.int32)
+        arrays["postings_tf"] = np.array([min(tf, 65535) for _, tf in flat], dtype=np.uint16)
+        arrays["passage_doc"] = np.array(passage_doc, dtype=np.int32)
+        arrays["passage_start"] = np.array(passage_start, dtype=np.int32)
+        arrays["passage_end"] = np.array(passage_end, dtype=np.int32)
+        arrays["passage_page"] = np.array(passage_page, dtype=np.int32)
+        arrays["passage_length"] = np.array(passage_length, dtype=np.int32)
+        arrays["passage_text_blob"], arrays["passage_text_offsets"] = _pack_strings(passage_texts)
+        arrays["doc_ids"] = np.array([doc_id.encode("ascii") for doc_id in doc_ids], dtype="S36")
+        arrays["doc_updated_at"] = np.array([value.encode("ascii") for value in doc_updated], dtype="S40")
+        arrays["doc_file_types"] = np.array([value.encode("ascii") for value in doc_types], dtype="S8")
+        arrays["doc_filename_blob"], arrays["doc_filename_offsets"] = _pack_strings(doc_names)
+        arrays["vectors"] = np.array(vectors, dtype=np.float32).reshape(len(vectors), embedder.dim)
+
+        header = self._new_header(watermark)
+        header["total_tokens"] = int(sum(passage_length))
+        header["documents"] = len(doc_ids)
+        header["passages"] = len(passage_doc)
+        header["created_at"] = time.time()
+        header["collection_id"] = self.collection_id
+
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"snapshot-{int(time.time() * 1000)}-{os.getpid()}"
+        tmp_path = os.path.join(self.directory, f".tmp-{name}")
+        os.makedirs(tmp_path)
+        for key in _ARRAYS:
+            np.save(os.path.join(tmp_path, f"{key}.npy"), arrays[key])
+        with open(os.path.join(tmp_path, "header.json"), "w") as f:
+            json.dump(header, f)
+        os.replace(tmp_path, os.path.join(self.directory, name))
+
+        # Swap the pointer atomically so concurrent readers see old or new, never half
+        pointer_tmp = os.path.join(self.directory, f".CURRENT-{os.getpid()}")
+        with open(pointer_tmp, "w") as f:
+            f.write(name)
+        os.replace(pointer_tmp, os.path.join(self.directory, "CURRENT"))
+        print(f"Wrote index snapshot {name}: {header['documents']} documents, {header['passages']} passages")
+        self._remove_old_snapshots(keep=name)
+
+    def _current_snapshot_name(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.directory, "CURRENT")) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _load_snapshot(self) -> Optional[_IndexState]:
+        name = self._current_snapshot_name()
+        if name is None:
+            return None
+        path = os.path.join(self.directory, name)
+
+        with open(os.path.join(path, "header.json")) as f:
+            header = json.load(f)
+        expected = self._new_header(None)
+        for key in ("version", "embedder", "embedding_model", "embedding_dim", "passage_size"):
+            if header.get(key) != expected[key]:
+                print(f"Ignoring index snapshot {name}: {key} is {header.get(key)!r}, expected {expected[key]!r}")
+                return None
+
+        base = {key: np.load(os.path.join(path, f"{key}.npy"), mmap_mode="r") for key in _ARRAYS}
+        header["name"] = name
+        return _IndexState(base, header)
+
+    def _remove_old_snapshots(self, keep: str):
+        """Unlink snapshots superseded for longer than the retention period.
+
+        A worker may have read CURRENT just before it changed and still be
+        opening the old arrays, or not have remapped yet; waiting out the
+        retention period covers both. Maps that are already open stay valid
+        after the files are unlinked.
+        """
+        snapshots = sorted(
+            (entry for entry in os.listdir(self.directory) if entry.startswith("snapshot-")),
+            key=lambda entry: int(entry.split("-")[1])
+        )
+        cutoff_ms = (time.time() - settings.SEARCH_INDEX_SNAPSHOT_RETENTION_SECONDS) * 1000
+        for entry, successor in zip(snapshots, snapshots[1:]):
+            # A snapshot stopped being current when its successor was written
+            if entry != keep and int(successor.split("-")[1]) < cutoff_ms:
+                shutil.rmtree(os.path.join(self.directory, entry), ignore_errors=True)
+
+
+class SearchIndexPool:
+    """Per-collection search indexes, loaded on first use and evicted LRU.
+
+    Only collections that are actually being queried hold delta structures
+    in memory; evicting an index drops its delta, and its snapshot pages
+    are released once in-flight searches finish with the old state.
+    """
+
+    def __init__(self, max_collections: Optional[int] = None):
+        self.max_collections = max_collections or settings.SEARCH_INDEX_MAX_COLLECTIONS
+        self._indexes: "OrderedDict[str, SearchIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, collection_id: str) -> SearchIndex:
+        """The collection's index, created (not loaded) if needed"""
+        with self._lock:
+            index = self._indexes.get(collection_id)
+            if index is not None:
+                self._indexes.move_to_end(collection_id)
+                return index
+
+            index = SearchIndex(collection_id)
+            self._indexes[collection_id] = index
+            while len(self._indexes) > self.max_collections:
+                evicted_id, _ = self._indexes.popitem(last=False)
+                self.evictions += 1
+                print(f"Evicted search index for collection {evicted_id}")
+            return index
+
+    def get_ready(self, collection_id: str) -> Optional[SearchIndex]:
+        """The collection's index if it is loaded; otherwise start loading it in the background.
+
+        Collections without documents get no index, so arbitrary collection ids
+        cannot start builds, write snapshots or evict real collections.
+        """
+        with self._lock:
+            pooled = collection_id in self._indexes
+        if not pooled and not self._collection_exists(collection_id):
+            return None
+
+        index = self.get(collection_id)
+        if index.ready:
+            return index
+
+        with self._lock:
+            # Failed loads are retried at most once per refresh interval
+            recently_attempted = index.last_load_attempt and (
+                time.monotonic() - index.last_load_attempt < settings.SEARCH_INDEX_REFRESH_SECONDS
+            )
+            if index.loading or recently_attempted:
+                return None
+            index.loading = True
+            index.last_load_attempt = time.monotonic()
+            self.loads += 1
+
+        threading.Thread(target=self._load, args=(index,), name=f"search-index-{collection_id}", daemon=True).start()
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Loaded collections, in least to most recently used order"""
+        with self._lock:
+            indexes = list(self._indexes.values())
+        return {
+            "max_collections": self.max_collections,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "collections": [index.stats() for index in indexes],
+        }
+
+    def _collection_exists(self, collection_id: str) -> bool:
+        try:
+            result = db.get_client().table("documents").select("id").eq(
+                "collection_id", collection_id
+            ).limit(1).execute()
+            return bool(result.data)
+        except Exception as e:
+            print(f"Collection lookup failed for {collection_id}: {str(e)}")
+            return False
+
+    def _load(self, index: SearchIndex):
+        try:
+            index.load_or_build()
+        finally:
+            index.loading = False
+
+
+search_indexes = SearchIndexPool()
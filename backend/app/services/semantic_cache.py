@@ -0,0 +1,155 @@
+import time
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, Any, FrozenSet, Optional, Tuple
+from ..core.config import settings
+from .embeddings import embedder, tokenize, HashingEmbedder
+
+
+def _content_terms(question: str) -> FrozenSet[str]:
+    return frozenset(token for token in tokenize(question) if len(token) >= settings.SEMANTIC_CACHE_MIN_TERM_LENGTH)
+
+
+class SemanticCache:
+    """In-memory answer cache keyed by question embeddings.
+
+    With the default hashing embedder it only recognises rewordings of the
+    same question ("What is the refund policy?" / "refund policy");
+    paraphrases that share no vocabulary need a dense ``EMBEDDING_MODEL``.
+
+    Questions are embedded into a fixed-size matrix so a lookup is a single
+    matrix-vector product. Entries remember the ``updated_at`` of every cited
+    document; callers must confirm those versions before serving a hit.
+    Entries are evicted least-recently-used once the cache is full.
+
+    Entries belong to a collection; lookups mask out slots stored for other
+    collections. While the content-word check is on (by default, only with the
+    hashing embedder) a candidate must also have the question's set of
+    content words, so "vacation days" never answers "sick days" however
+    close the vectors are.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, threshold: Optional[float] = None, ttl_seconds: Optional[int] = None):
+        self.max_entries = max_entries or settings.SEMANTIC_CACHE_MAX_ENTRIES
+        self.threshold = threshold or settings.SEMANTIC_CACHE_THRESHOLD
+        self.require_same_terms = settings.SEMANTIC_CACHE_REQUIRE_SAME_TERMS
+        if self.require_same_terms is None:
+            self.require_same_terms = isinstance(embedder, HashingEmbedder)
+        self.ttl_seconds = ttl_seconds or settings.SEMANTIC_CACHE_TTL_SECONDS
+
+        self._vectors = np.zeros((self.max_entries, embedder.dim), dtype=np.float32)
+        self._slot_collections = np.full(self.max_entries, -1, dtype=np.int32)
+        self._collection_codes: Dict[str, int] = {}
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._free_slots = list(range(self.max_entries - 1, -1, -1))
+
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def lookup(self, question: str, collection_id: Optional[str] = None) -> Optional[Tuple[int, Dict[str, Any], float]]:
+        """Find the closest cached question in the collection above the similarity threshold"""
+        code = self._collection_codes.get(collection_id or settings.DEFAULT_COLLECTION)
+        if not self._entries or code is None:
+            self.misses += 1
+            return None
+
+        # Unused slots hold zero vectors, so they can never pass the threshold
+        similarities = self._vectors @ embedder.embed_one(question)
+        similarities[self._slot_collections != code] = 0.0
+        candidates = np.flatnonzero(similarities >= self.threshold)
+        candidates = candidates[np.argsort(-similarities[candidates])]
+
+        terms = _content_terms(question) if self.require_same_terms else None
+        slot = entry = None
+        for candidate in candidates:
+            candidate_entry = self._entries.get(int(candidate))
+            if candidate_entry is not None and (terms is None or candidate_entry["terms"] == terms):
+                slot, entry = int(candidate), candidate_entry
+                break
+
+        if entry is None:
+            self.misses += 1
+            return None
+        similarity = float(similarities[slot])
+
+        if time.monotonic() - entry["stored_at"] > self.ttl_seconds:
+            self._release(slot)
+            self.misses += 1
+            return None
+
+        return slot, entry, similarity
+
+    def record_hit(self, slot: int):
+        """Mark an entry as served after its documents were validated"""
+        self.hits += 1
+        self._entries.move_to_end(slot)
+
+    def invalidate(self, slot: int):
+        """Drop an entry whose cited documents changed since it was stored"""
+        if slot in self._entries:
+            self._release(slot)
+            self.stale += 1
+        self.misses += 1
+
+    def store(
+        self,
+        question: str,
+        response: Dict[str, Any],
+        document_versions: Dict[str, Any],
+        collection_id: Optional[str] = None,
+    ):
+        """Cache an answer together with the versions of the documents it cites"""
+        if not self._free_slots:
+            oldest_slot, _ = self._entries.popitem(last=False)
+            self._vectors[oldest_slot] = 0.0
+            self._slot_collections[oldest_slot] = -1
+            self._free_slots.append(oldest_slot)
+            self.evictions += 1
+
+        collection_id = collection_id or settings.DEFAULT_COLLECTION
+        code = self._collection_codes.setdefault(collection_id, len(self._collection_codes))
+        slot = self._free_slots.pop()
+        self._vectors[slot] = embedder.embed_one(question)
+        self._slot_collections[slot] = code
+        self._entries[slot] = {
+            "question": question,
+            "terms": _content_terms(question),
+            "collection_id": collection_id,
+            "response": response,
+            "document_versions": document_versions,
+            "stored_at": time.monotonic(),
+        }
+
+    def clear(self):
+        """Remove every cached answer"""
+        self._vectors[:] = 0.0
+        self._slot_collections[:] = -1
+        self._entries.clear()
+        self._free_slots = list(range(self.max_entries - 1, -1, -1))
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit rate, sizing and eviction counters"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "require_same_terms": self.require_same_terms,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _release(self, slot: int):
+        self._entries.pop(slot, None)
+        self._vectors[slot] = 0.0
+        self._slot_collections[slot] = -1
+        self._free_slots.append(slot)
+
+
+semantic_cache = SemanticCache()
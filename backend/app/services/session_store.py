@@ -0,0 +1,187 @@
+import re
+import time
+import uuid
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+from ..core.config import settings
+from .embeddings import STOPWORDS
+
+
+# Words that make a question depend on what was said before it
+_FOLLOW_UP_WORDS = frozenset(
+    "it its this that these those they them their he she him her one ones "
+    "there above same also else more".split()
+)
+# Longer than stopwords but just as empty: "what about tablets?" is about tablets
+_FILLER_WORDS = frozenset("about please tell".split())
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s")
+
+
+def content_words(text: str) -> List[str]:
+    """Words that carry the topic of a question, without anaphora or stopwords"""
+    return [
+        word for word in dict.fromkeys(_WORD_RE.findall(text.lower()))
+        if len(word) > 3 and word not in STOPWORDS and word not in _FOLLOW_UP_WORDS and word not in _FILLER_WORDS
+    ]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count; about four characters per token for English"""
+    return len(text) // 4 + 1 if text else 0
+
+
+class SessionStore:
+    """Server-side conversation sessions with TTL eviction.
+
+    Sessions are kept in an OrderedDict ordered by last activity, so expired
+    sessions are always at the front and eviction stops at the first live
+    one. Older turns are folded into an extractive summary whenever the
+    history exceeds ``SESSION_HISTORY_TOKEN_BUDGET``, which keeps the prompt
+    size per turn bounded however long the conversation runs.
+    """
+
+    def __init__(self):
+        self.ttl_seconds = settings.SESSION_TTL_SECONDS
+        self.max_sessions = settings.SESSION_MAX_SESSIONS
+        self.history_budget = settings.SESSION_HISTORY_TOKEN_BUDGET
+        self.summary_budget = settings.SESSION_SUMMARY_TOKEN_BUDGET
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def create(self, collection_id: Optional[str] = None) -> Dict[str, Any]:
+        """Start a new empty session scoped to one collection"""
+        self._evict_expired()
+        while len(self._sessions) >= self.max_sessions:
+            self._sessions.popitem(last=False)
+
+        now = time.monotonic()
+        session = {
+            "id": str(uuid.uuid4()),
+            "collection_id": collection_id or settings.DEFAULT_COLLECTION,
+            "created_at": now,
+            "last_active": now,
+            "turns": [],
+            "summary": "",
+            "passages": [],
+            "passages_query": None,
+        }
+        self._sessions[session["id"]] = session
+        return session
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Fetch a live session and refresh its TTL"""
+        self._evict_expired()
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        session["last_active"] = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def delete(self, session_id: str) -> bool:
+        """End a session early"""
+        return self._sessions.pop(session_id, None) is not None
+
+    def rewrite_question(self, session: Dict[str, Any], question: str) -> str:
+        """Turn a follow-up into a standalone query for retrieval.
+
+        Follow-ups are detected by anaphora or by having at most one content
+        word of their own ("what about tablets?"), and are expanded with the
+        content words of the previous standalone question that they do not
+        already mention.
+        """
+        if not session["turns"]:
+            return question
+
+        words = _WORD_RE.findall(question.lower())
+        if not (_FOLLOW_UP_WORDS.intersection(words) or len(content_words(question)) < 2):
+            return question
+
+        previous = session["turns"][-1]["standalone_question"]
+        carried = [word for word in content_words(previous) if word not in words]
+        if not carried:
+            return question
+        return f"{question} ({' '.join(carried)})"
+
+    def add_turn(
+        self,
+        session: Dict[str, Any],
+        question: str,
+        standalone_question: str,
+        answer: str,
+        passages: List[Dict[str, Any]],
+    ):
+        """Record a turn and the passages it was answered from"""
+        session["turns"].append({
+            "question": question,
+            "standalone_question": standalone_question,
+            "answer": answer,
+        })
+        if passages:
+            session["passages"] = passages
+            session["passages_query"] = standalone_question
+        self._compact(session)
+
+    def render_history(self, session: Dict[str, Any]) -> str:
+        """Conversation context for the prompt, never above the token budget"""
+        parts = []
+        if session["summary"]:
+            parts.append(f"Summary of earlier conversation: {session['summary']}")
+        for turn in session["turns"]:
+            parts.append(f"User: {turn['question']}\nAssistant: {turn['answer']}")
+
+        history = "\n\n".join(parts)
+        max_chars = self.history_budget * 4
+        if len(history) > max_chars:
+            # A single oversized turn can still exceed the budget; keep its tail
+            history = "..." + history[-max_chars:]
+        return history
+
+    def describe(self, session: Dict[str, Any]) -> Dict[str, Any]:
+        """Public view of a session"""
+        return {
+            "session_id": session["id"],
+            "collection_id": session["collection_id"],
+            "turns": [
+                {"question": turn["question"], "answer": turn["answer"]}
+                for turn in session["turns"]
+            ],
+            "summary": session["summary"],
+            "history_tokens": estimate_tokens(self.render_history(session)),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Number of live sessions"""
+        self._evict_expired()
+        return {"sessions": len(self._sessions), "max_sessions": self.max_sessions}
+
+    def _compact(self, session: Dict[str, Any]):
+        """Fold the oldest turns into the summary until history fits the budget"""
+        while len(session["turns"]) > 1 and self._history_tokens(session) > self.history_budget:
+            turn = session["turns"].pop(0)
+            first_sentence = _SENTENCE_END_RE.split(turn["answer"].strip(), maxsplit=1)[0]
+            summary = f"{session['summary']} Q: {turn['question']} A: {first_sentence}".strip()
+
+            max_chars = self.summary_budget * 4
+            if len(summary) > max_chars:
+                # Keep the most recent part of the rolled-up summary
+                summary = summary[-max_chars:]
+                summary = summary[summary.find(" ") + 1:]
+            session["summary"] = summary
+
+    def _history_tokens(self, session: Dict[str, Any]) -> int:
+        return estimate_tokens(session["summary"]) + sum(
+            estimate_tokens(turn["question"]) + estimate_tokens(turn["answer"])
+            for turn in session["turns"]
+        )
+
+    def _evict_expired(self):
+        cutoff = time.monotonic() - self.ttl_seconds
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session["last_active"] >= cutoff:
+                break
+            del self._sessions[session_id]
+
+
+session_store = SessionStore()
@@ -1,7 +1,8 @@
 from fastapi import UploadFile
 import uuid
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List
+from ..core.config import settings
 from ..core.database import db
 from ..models.document import DocumentType
 
@@ -68,28 +69,32 @@ class StorageService:
     
     async def upload_file(self, file: UploadFile) -> dict:
         """Upload file to Supabase storage"""
+        print(f"Starting upload for file: {file.filename}")
+        
+        # Read file content
+        content = await file.read()
+        print(f"Read {len(content)} bytes from file")
+        
+        return self.upload_bytes(content, file.filename, file.content_type)
+    
+    def upload_bytes(self, content: bytes, filename: str, content_type: Optional[str] = None) -> dict:
+        """Upload raw file content to Supabase storage"""
         try:
-            print(f"Starting upload for file: {file.filename}")
-            
             # Validate file type
-            file_type = self._get_file_type(file.filename)
-            file_path = self._generate_file_path(file_type, file.filename)
+            file_type = self._get_file_type(filename)
+            file_path = self._generate_file_path(file_type, filename)
             
             print(f"Generated file path: {file_path}")
             
-            # Read file content
-            content = await file.read()
-            print(f"Read {len(content)} bytes from file")
-            
             # Upload to Supabase storage
-            print(f"Uploading to bucket: {self.bucket_name}")
+            # Paths are unique per upload, so objects never change and can be cached forever
             result = self.supabase.storage.from_(self.bucket_name).upload(
-                file_path, content, file_options={"content-type": file.content_type}
+                file_path, content, file_options={
+                    "content-type": content_type or "application/octet-stream",
+                    "cache-control": "31536000"
+                }
             )
             
-            print(f"Upload result type: {type(result)}")
-            print(f"Upload result: {result}")
-            
             # Handle different response formats
             if hasattr(result, 'error') and result.error:
                 print(f"Upload error details: {result.error}")
@@ -98,8 +103,6 @@ class StorageService:
                 print(f"Upload failed with status: {result.status_code}")
                 raise Exception(f"Upload failed with status: {result.status_code}")
             
-            print(f"Upload successful!")
-            
             return {
                 "file_path": file_path,
                 "file_type": file_type,
@@ -114,6 +117,29 @@ class StorageService:
             print(f"Unexpected upload error: {str(e)}")
             raise Exception(f"File upload failed: {str(e)}")
     
+    def upload_thumbnail(self, content_hash: str, data: bytes) -> str:
+        """Upload a WebP thumbnail under a path derived from the source file's hash"""
+        file_path = f"thumbnails/{content_hash}.webp"
+        result = self.supabase.storage.from_(self.bucket_name).upload(
+            file_path, data, file_options={
+                "content-type": "image/webp",
+                "cache-control": "31536000",
+                "upsert": "true"  # Identical files share one thumbnail
+            }
+        )
+        if hasattr(result, 'error') and result.error:
+            raise Exception(f"Thumbnail upload failed: {result.error}")
+        return file_path
+    
+    def get_public_url(self, file_path: str) -> str:
+        """Public URL built locally; stable for a path, so browsers and CDNs can cache it"""
+        return f"{settings.SUPABASE_URL.rstrip('/')}/storage/v1/object/public/{self.bucket_name}/{file_path}"
+    
+    def remove_files(self, file_paths: List[str]):
+        """Remove objects from storage, e.g. after a failed database insert"""
+        if file_paths:
+            self.supabase.storage.from_(self.bucket_name).remove(file_paths)
+    
     def get_file_url(self, file_path: str) -> str:
         """Get public URL for file"""
         try:
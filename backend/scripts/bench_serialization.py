@@ -0,0 +1,136 @@
+"""Measure the per-row cost of serializing document listings.
+
+Compares the old path (a DocumentResponse built per row with
+datetime.fromisoformat, then validated and encoded again by FastAPI's
+response_model handling) with model_construct, plain rows encoded by orjson,
+and the paged stream used for large listings. Rows are synthetic and shaped
+like LISTING_COLUMNS, so no database is needed:
+
+    python scripts/bench_serialization.py --rows 20000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List
+
+from pydantic import TypeAdapter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.core.responses import ORJSONResponse, stream_json_array  # noqa: E402
+from app.models.document import DocumentResponse, DocumentType  # noqa: E402
+
+PAGE_SIZE = 500
+THUMBNAIL_BASE = "https://example.supabase.co/storage/v1/object/public/documents/thumbnails/"
+
+listing_adapter = TypeAdapter(List[DocumentResponse])
+
+
+def make_rows(count: int) -> List[Dict[str, Any]]:
+    """Rows as PostgREST returns them, after thumbnail_url was derived"""
+    started = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    rows = []
+    for i in range(count):
+        file_type = random.choice(["txt", "pdf", "img"])
+        metadata = {"file_type": file_type, "original_filename": f"document-{i}.{file_type}", "text_length": random.randint(100, 200000)}
+        rows.append({
+            "id": str(uuid.uuid4()),
+            "filename": f"document-{i}.{file_type}",
+            "file_type": file_type,
+            "file_size": random.randint(1000, 5000000),
+            "upload_date": (started + timedelta(seconds=i * 37)).isoformat(timespec="microseconds"),
+            "collection_id": "default",
+            "metadata": metadata,
+            "thumbnail_url": THUMBNAIL_BASE + f"{i:064x}.webp" if file_type != "txt" else None,
+        })
+    return rows
+
+
+def legacy(rows: List[Dict[str, Any]]) -> int:
+    """Per-row models, then FastAPI's response_model dump, validate and json.dumps"""
+    models = [
+        DocumentResponse(
+            id=doc["id"],
+            filename=doc["filename"],
+            file_type=DocumentType(doc["file_type"]),
+            file_size=doc["file_size"],
+            upload_date=datetime.fromisoformat(doc["upload_date"].replace('Z', '+00:00')),
+            collection_id=doc["collection_id"],
+            metadata=doc["metadata"],
+            thumbnail_url=doc["thumbnail_url"]
+        )
+        for doc in rows
+    ]
+    value = listing_adapter.validate_python([model.model_dump() for model in models])
+    content = listing_adapter.dump_python(value, mode="json")
+    return len(json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8"))
+
+
+def model_construct(rows: List[Dict[str, Any]]) -> int:
+    """Unvalidated models encoded by pydantic-core"""
+    models = [DocumentResponse.model_construct(**doc) for doc in rows]
+    return len(listing_adapter.dump_json(models, warnings=False))
+
+
+def orjson_rows(rows: List[Dict[str, Any]]) -> int:
+    """Plain rows rendered by ORJSONResponse in one body"""
+    return len(ORJSONResponse(rows).body)
+
+
+def streamed(rows: List[Dict[str, Any]]) -> int:
+    """Plain rows encoded page by page; chunks are dropped as a socket would send them"""
+    pages = (rows[i:i + PAGE_SIZE] for i in range(0, len(rows), PAGE_SIZE))
+    return sum(len(chunk) for chunk in stream_json_array(pages))
+
+
+VARIANTS: Dict[str, Callable[[List[Dict[str, Any]]], int]] = {
+    "legacy (models + response_model)": legacy,
+    "model_construct + dump_json": model_construct,
+    "orjson rows": orjson_rows,
+    "orjson streamed pages": streamed,
+}
+
+
+def measure(fn: Callable[[List[Dict[str, Any]]], int], rows: List[Dict[str, Any]], repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        size = fn(rows)
+        best = min(best, time.perf_counter() - started)
+
+    tracemalloc.start()
+    fn(rows)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark document listing serialization")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per variant; the fastest is reported")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    rows = make_rows(args.rows)
+    print(f"{args.rows} rows, best of {args.repeat}\n")
+    print(f"{'variant':36} {'us/row':>8} {'total ms':>9} {'peak MB':>8} {'body KB':>8}")
+
+    baseline = None
+    for name, fn in VARIANTS.items():
+        elapsed, peak, size = measure(fn, rows, args.repeat)
+        per_row = elapsed / args.rows * 1e6
+        baseline = baseline or per_row
+        print(f"{name:36} {per_row:8.2f} {elapsed * 1000:9.1f} {peak / 2 ** 20:8.2f} {size / 1024:8.0f}"
+              f"   {baseline / per_row:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
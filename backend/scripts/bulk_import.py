@@ -0,0 +1,305 @@
+"""Bulk import a directory or archive into the knowledge base.
+
+Walks a directory, .zip or .tar(.gz/.bz2/.xz) archive, extracts text and
+thumbnails with a process pool, uploads originals to storage from a thread
+pool and inserts document rows in batches. Progress is appended to a checkpoint file after
+every committed batch, so an interrupted run resumes where it stopped.
+Files whose SHA-256 already exists in the target collection are skipped.
+
+    python scripts/bulk_import.py /data/archive.zip --collection legal --workers 8 --upload-concurrency 16
+"""
+import argparse
+import json
+import mimetypes
+import os
+import re
+import sys
+import tarfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional, Set, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.core.config import settings  # noqa: E402
+from app.models.document import COLLECTION_ID_PATTERN, DocumentType  # noqa: E402
+from app.services.document_processor import document_processor  # noqa: E402
+
+PAGE_SIZE = 1000
+
+
+def _extract(job: Tuple[bytes, str, str]) -> Tuple[Optional[str], Optional[List[int]], dict, Optional[bytes]]:
+    """Process-pool worker: text, page offsets, metadata and thumbnail for one file"""
+    content, file_type, filename = job
+    doc_type = DocumentType(file_type)
+    text_content, page_offsets = document_processor.extract_text_with_pages(content, doc_type, filename)
+    metadata = document_processor.get_document_metadata(content, doc_type, filename)
+    return text_content, page_offsets, metadata, document_processor.create_thumbnail(content, doc_type)
+
+
+def _file_type(name: str) -> Optional[str]:
+    ext = os.path.splitext(name)[1].lower()
+    if ext not in settings.ALLOWED_EXTENSIONS:
+        return None
+    return {".txt": "txt", ".pdf": "pdf"}.get(ext, "img")
+
+
+def iter_source(source: str) -> Iterator[Tuple[str, Any]]:
+    """Yield (entry name, zero-argument reader) for every supported file"""
+    if os.path.isdir(source):
+        for root, _, files in os.walk(source):
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                if _file_type(name):
+                    yield os.path.relpath(path, source), lambda path=path: open(path, "rb").read()
+    elif zipfile.is_zipfile(source):
+        archive = zipfile.ZipFile(source)
+        for info in archive.infolist():
+            if not info.is_dir() and _file_type(info.filename):
+                yield info.filename, lambda info=info: archive.read(info)
+    elif tarfile.is_tarfile(source):
+        # Stream mode reads members in archive order without seeking back
+        with tarfile.open(source, "r|*") as archive:
+            for member in archive:
+                if member.isfile() and _file_type(member.name):
+                    data = archive.extractfile(member).read()
+                    yield member.name, lambda data=data: data
+    else:
+        raise SystemExit(f"Unsupported source: {source}")
+
+
+class Checkpoint:
+    """Append-only record of entries that were fully imported.
+
+    Records are keyed by source and collection, so one checkpoint file can be
+    shared by runs over different archives or into different collections.
+    Records without a source (written by older versions) are ignored.
+    """
+
+    def __init__(self, path: str, source: str, collection_id: str):
+        self.path = path
+        self.source = os.path.abspath(source)
+        self.collection_id = collection_id
+        self.done: Set[str] = set()
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    if record.get("source") == self.source and record.get("collection") == self.collection_id:
+                        self.done.add(record["entry"])
+
+    def record(self, entries: List[str]):
+        with open(self.path, "a") as f:
+            for entry in entries:
+                f.write(json.dumps({"entry": entry, "source": self.source, "collection": self.collection_id}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.done.update(entries)
+
+
+class BulkImporter:
+    def __init__(self, args: argparse.Namespace):
+        # Imported lazily so --help works without database credentials
+        from app.core.database import db
+        from app.services.storage import storage_service
+
+        self.args = args
+        self.supabase = db.get_admin_client()
+        self.storage = storage_service
+        self.checkpoint = Checkpoint(args.checkpoint, args.source, args.collection)
+        self.known_hashes = self._load_known_hashes()
+        self.stats = {
+            "seen": 0, "imported": 0, "skipped_checkpoint": 0, "skipped_duplicate": 0,
+            "failed": 0, "bytes": 0, "extract_seconds": 0.0, "upload_seconds": 0.0, "insert_seconds": 0.0,
+        }
+
+    def _load_known_hashes(self) -> Set[str]:
+        hashes = set()
+        offset = 0
+        while True:
+            result = self.supabase.table("documents").select("content_hash").eq(
+                "collection_id", self.args.collection
+            ).not_.is_("content_hash", "null").range(offset, offset + PAGE_SIZE - 1).execute()
+            hashes.update(row["content_hash"] for row in result.data)
+            if len(result.data) < PAGE_SIZE:
+                return hashes
+            offset += PAGE_SIZE
+
+    def run(self):
+        started = time.perf_counter()
+        batch: List[Dict[str, Any]] = []
+        with ProcessPoolExecutor(max_workers=self.args.workers) as extract_pool, \
+                ThreadPoolExecutor(max_workers=self.args.upload_concurrency) as upload_pool:
+            for entry, read in iter_source(self.args.source):
+                self.stats["seen"] += 1
+                if entry in self.checkpoint.done:
+                    self.stats["skipped_checkpoint"] += 1
+                    continue
+
+                content = read()
+                content_hash = document_processor.compute_content_hash(content)
+                if content_hash in self.known_hashes:
+                    self.stats["skipped_duplicate"] += 1
+                    continue
+                self.known_hashes.add(content_hash)
+
+                batch.append({
+                    "entry": entry,
+                    "filename": os.path.basename(entry),
+                    "file_type": _file_type(entry),
+                    "content": content,
+                    "content_hash": content_hash,
+                })
+                if len(batch) >= self.args.batch_size:
+                    self._import_batch(batch, extract_pool, upload_pool)
+                    batch = []
+                    self._report_progress(started)
+
+            if batch:
+                self._import_batch(batch, extract_pool, upload_pool)
+
+        self._report(time.perf_counter() - started)
+
+    def _import_batch(self, batch: List[Dict[str, Any]], extract_pool: ProcessPoolExecutor, upload_pool: ThreadPoolExecutor):
+        """Extract and upload a batch concurrently, then insert its rows in one request"""
+        if self.args.dry_run:
+            self.stats["imported"] += len(batch)
+            return
+
+        phase_started = time.perf_counter()
+        uploads = [
+            upload_pool.submit(
+                self.storage.upload_bytes,
+                item["content"], item["filename"], mimetypes.guess_type(item["filename"])[0]
+            )
+            for item in batch
+        ]
+        extractions = list(extract_pool.map(
+            _extract, [(item["content"], item["file_type"], item["filename"]) for item in batch]
+        ))
+        thumbnails = [
+            upload_pool.submit(self.storage.upload_thumbnail, item["content_hash"], thumbnail) if thumbnail else None
+            for item, (_, _, _, thumbnail) in zip(batch, extractions)
+        ]
+        self.stats["extract_seconds"] += time.perf_counter() - phase_started
+
+        # Uploads ran alongside extraction; only the remaining wait is counted
+        upload_wait_started = time.perf_counter()
+        rows, entries, uploaded_paths, thumbnail_paths = [], [], [], []
+        now = datetime.utcnow().isoformat()
+        for item, upload, thumbnail, (text_content, page_offsets, metadata, _) in zip(batch, uploads, thumbnails, extractions):
+            thumbnail_path = None
+            if thumbnail:
+                try:
+                    thumbnail_path = thumbnail.result()
+                    thumbnail_paths.append(thumbnail_path)
+                except Exception as e:
+                    print(f"Thumbnail upload failed for {item['entry']}: {str(e)}")
+            try:
+                upload_result = upload.result()
+            except Exception as e:
+                print(f"Failed to upload {item['entry']}: {str(e)}")
+                self.stats["failed"] += 1
+                # Let a later copy of the same file in this run be imported instead
+                self.known_hashes.discard(item["content_hash"])
+                continue
+            uploaded_paths.append(upload_result["file_path"])
+            entries.append(item["entry"])
+            self.stats["bytes"] += len(item["content"])
+            preview_text, preview_truncated = document_processor.create_preview_text(text_content)
+            rows.append({
+                "filename": item["filename"],
+                "file_type": upload_result["file_type"].value,
+                "file_path": upload_result["file_path"],
+                "file_size": upload_result["file_size"],
+                "collection_id": self.args.collection,
+                "content": text_content,
+                "metadata": metadata,
+                "page_offsets": page_offsets or None,
+                "content_hash": item["content_hash"],
+                "preview_text": preview_text,
+                "preview_truncated": preview_truncated,
+                "thumbnail_path": thumbnail_path,
+                "upload_date": now,
+                "created_at": now,
+                "updated_at": now,
+            })
+        self.stats["upload_seconds"] += time.perf_counter() - upload_wait_started
+
+        if not rows:
+            self._remove_unused_thumbnails(thumbnail_paths)
+            return
+
+        insert_started = time.perf_counter()
+        try:
+            self.supabase.table("documents").insert(rows).execute()
+        except Exception as e:
+            print(f"Batch insert failed, removing {len(uploaded_paths)} uploaded objects: {str(e)}")
+            self.storage.remove_files(uploaded_paths)
+            self._remove_unused_thumbnails(thumbnail_paths)
+            self.stats["failed"] += len(rows)
+            for row in rows:
+                self.known_hashes.discard(row["content_hash"])
+            return
+        finally:
+            self.stats["insert_seconds"] += time.perf_counter() - insert_started
+
+        self.checkpoint.record(entries)
+        self.stats["imported"] += len(rows)
+        # Thumbnails of files whose own upload failed are not referenced by any row
+        referenced = {row["thumbnail_path"] for row in rows}
+        self._remove_unused_thumbnails([path for path in thumbnail_paths if path not in referenced])
+
+    def _remove_unused_thumbnails(self, paths: List[str]):
+        """Remove thumbnails no document references; identical files in other collections share them"""
+        if not paths:
+            return
+        try:
+            result = self.supabase.table("documents").select("thumbnail_path").in_("thumbnail_path", paths).execute()
+            used = {row["thumbnail_path"] for row in result.data}
+            self.storage.remove_files([path for path in dict.fromkeys(paths) if path not in used])
+        except Exception as e:
+            print(f"Failed to remove unused thumbnails: {str(e)}")
+
+    def _report_progress(self, started: float):
+        elapsed = time.perf_counter() - started
+        print(f"[{elapsed:8.1f}s] seen {self.stats['seen']}, imported {self.stats['imported']}, "
+              f"{self.stats['imported'] / elapsed:.1f} files/s")
+
+    def _report(self, elapsed: float):
+        stats = self.stats
+        megabytes = stats["bytes"] / (1024 * 1024)
+        print("\nBulk import finished")
+        print(f"  files seen:             {stats['seen']}")
+        print(f"  imported:               {stats['imported']}")
+        print(f"  skipped (checkpoint):   {stats['skipped_checkpoint']}")
+        print(f"  skipped (duplicate):    {stats['skipped_duplicate']}")
+        print(f"  failed:                 {stats['failed']}")
+        print(f"  elapsed:                {elapsed:.1f}s")
+        print(f"  throughput:             {stats['imported'] / max(elapsed, 1e-9):.1f} files/s, {megabytes / max(elapsed, 1e-9):.2f} MB/s")
+        print(f"  extract / extra upload wait / insert: "
+              f"{stats['extract_seconds']:.1f}s / {stats['upload_seconds']:.1f}s / {stats['insert_seconds']:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import documents into the knowledge base")
+    parser.add_argument("source", help="Directory, .zip or .tar archive to import")
+    parser.add_argument("--collection", default=settings.DEFAULT_COLLECTION, help="Collection to import into")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Text extraction processes")
+    parser.add_argument("--upload-concurrency", type=int, default=8, help="Concurrent storage uploads")
+    parser.add_argument("--batch-size", type=int, default=100, help="Rows per database insert")
+    parser.add_argument("--checkpoint", default=".bulk_import_checkpoint.jsonl", help="Progress file for resuming")
+    parser.add_argument("--dry-run", action="store_true", help="Walk and hash files without writing anything")
+    args = parser.parse_args()
+    if not re.match(COLLECTION_ID_PATTERN, args.collection):
+        parser.error(f"invalid collection id: {args.collection}")
+
+    BulkImporter(args).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Local stand-in for the DeepSeek chat completions API.
+
+Used to exercise the LLM gateway's timeouts, retries, hedging and circuit
+breaker without calling the real upstream. Behaviour is controlled with
+environment variables:
+
+    FAKE_LLM_LATENCY_MS     base latency per request (default 200)
+    FAKE_LLM_JITTER_MS      extra uniform random latency (default 0)
+    FAKE_LLM_SLOW_RATE      fraction of requests that take FAKE_LLM_SLOW_MS (default 0)
+    FAKE_LLM_SLOW_MS        latency of slow requests (default 10000)
+    FAKE_LLM_ERROR_RATE     fraction of requests answered with a 503 (default 0)
+
+Run it and point the backend at it:
+
+    python scripts/fake_llm_server.py --port 9000
+    DEEPSEEK_BASE_URL=http://localhost:9000/v1 uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+import uuid
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+app = FastAPI(title="Fake LLM")
+
+
+def _env(name: str, default: float) -> float:
+    return float(os.environ.get(name, default))
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+
+    latency_ms = _env("FAKE_LLM_LATENCY_MS", 200) + random.uniform(0, _env("FAKE_LLM_JITTER_MS", 0))
+    if random.random() < _env("FAKE_LLM_SLOW_RATE", 0):
+        latency_ms = _env("FAKE_LLM_SLOW_MS", 10000)
+    await asyncio.sleep(latency_ms / 1000.0)
+
+    if random.random() < _env("FAKE_LLM_ERROR_RATE", 0):
+        return JSONResponse(status_code=503, content={"error": {"message": "Service unavailable", "type": "server_error"}})
+
+    question = body["messages"][-1]["content"].rsplit("Question:", 1)[-1].split("\n", 1)[0].strip()
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": f"Fake answer to: {question}"},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run a fake OpenAI-compatible LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port)
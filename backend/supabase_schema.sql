@@ -9,8 +9,14 @@ CREATE TABLE IF NOT EXISTS documents (
     file_path TEXT NOT NULL UNIQUE,
     file_size INTEGER NOT NULL,
     upload_date TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    collection_id TEXT NOT NULL DEFAULT 'default', -- Namespace; questions search a single collection
     content TEXT, -- Extracted text content
     metadata JSONB, -- Additional metadata
+    page_offsets JSONB, -- Character offset of each page in content, for page-level citations
+    content_hash TEXT, -- SHA-256 of the original file, used to skip duplicates
+    preview_text TEXT, -- Truncated snippet of content for previews
+    preview_truncated BOOLEAN NOT NULL DEFAULT FALSE, -- True when preview_text is shorter than content
+    thumbnail_path TEXT, -- WebP thumbnail in storage, for images and PDFs
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
@@ -19,9 +25,57 @@ CREATE TABLE IF NOT EXISTS documents (
 CREATE INDEX IF NOT EXISTS idx_documents_file_type ON documents(file_type);
 CREATE INDEX IF NOT EXISTS idx_documents_upload_date ON documents(upload_date DESC);
 CREATE INDEX IF NOT EXISTS idx_documents_filename ON documents(filename);
+CREATE INDEX IF NOT EXISTS idx_documents_content_hash ON documents(content_hash);
+CREATE INDEX IF NOT EXISTS idx_documents_updated_at ON documents(updated_at);
+CREATE INDEX IF NOT EXISTS idx_documents_collection_upload_date ON documents(collection_id, upload_date DESC);
+CREATE INDEX IF NOT EXISTS idx_documents_collection_updated_at ON documents(collection_id, updated_at);
 
--- Create full-text search index on content
-CREATE INDEX IF NOT EXISTS idx_documents_content_fts ON documents USING gin(to_tsvector('english', content));
+-- Migration for existing databases
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS content_hash TEXT;
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS preview_text TEXT;
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS thumbnail_path TEXT;
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS collection_id TEXT NOT NULL DEFAULT 'default';
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS page_offsets JSONB;
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS preview_truncated BOOLEAN NOT NULL DEFAULT FALSE;
+UPDATE documents SET preview_truncated = TRUE
+WHERE preview_text IS NOT NULL AND preview_text IS DISTINCT FROM content AND NOT preview_truncated;
+-- Page offsets used to live in metadata, which listings return; move them out
+UPDATE documents
+SET page_offsets = metadata->'page_offsets', metadata = metadata - 'page_offsets'
+WHERE metadata ? 'page_offsets';
+DROP INDEX IF EXISTS idx_documents_content_fts; -- Replaced by the per-collection index below
+
+-- Create full-text search index on content, partitioned by collection.
+-- btree_gin lets one GIN index answer both the collection_id equality and
+-- the text match, so a scoped search only visits its own collection's entries.
+CREATE EXTENSION IF NOT EXISTS btree_gin;
+CREATE INDEX IF NOT EXISTS idx_documents_collection_content_fts
+    ON documents USING gin(collection_id, to_tsvector('english', content));
+
+-- A very large collection can additionally get its own partial index, e.g.
+-- CREATE INDEX idx_documents_content_fts_legal ON documents
+--     USING gin(to_tsvector('english', content)) WHERE collection_id = 'legal';
+
+-- Collections and their sizes, for the collection picker
+CREATE OR REPLACE FUNCTION list_collections()
+RETURNS TABLE (collection_id TEXT, document_count BIGINT)
+LANGUAGE sql STABLE AS $$
+    SELECT d.collection_id, count(*)
+    FROM documents d
+    GROUP BY d.collection_id
+    ORDER BY d.collection_id;
+$$;
+
+-- Return a slice of a document's extracted text so cited spans can be
+-- previewed without transferring the whole content column.
+-- Offsets are 0-based character positions, end exclusive.
+CREATE OR REPLACE FUNCTION get_document_span(doc_id UUID, span_start INTEGER, span_end INTEGER)
+RETURNS TABLE (id UUID, filename TEXT, file_type TEXT, content TEXT)
+LANGUAGE sql STABLE AS $$
+    SELECT d.id, d.filename, d.file_type, substr(d.content, span_start + 1, span_end - span_start)
+    FROM documents d
+    WHERE d.id = doc_id;
+$$;
 
 -- Create storage bucket (run this in Supabase dashboard or via client)
 -- This needs to be done via the Supabase interface:
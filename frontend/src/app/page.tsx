@@ -6,17 +6,20 @@ import DocumentUpload from '@/components/DocumentUpload';
 import DocumentList from '@/components/DocumentList';
 import DocumentPreview from '@/components/DocumentPreview';
 import QAInterface from '@/components/QAInterface';
+import { DocumentSpan } from '@/lib/api';
 
 export default function HomePage() {
   const [selectedDocumentId, setSelectedDocumentId] = useState<string | null>(null);
+  const [selectedSpan, setSelectedSpan] = useState<DocumentSpan | undefined>(undefined);
   const [refreshDocuments, setRefreshDocuments] = useState(false);
 
   const handleUploadSuccess = () => {
     setRefreshDocuments(!refreshDocuments);
   };
 
-  const handleDocumentSelect = (documentId: string) => {
+  const handleDocumentSelect = (documentId: string, span?: DocumentSpan) => {
     setSelectedDocumentId(documentId);
+    setSelectedSpan(span);
   };
 
   const handleClosePreview = () => {
@@ -68,6 +71,7 @@ export default function HomePage() {
       {selectedDocumentId && (
         <DocumentPreview
           documentId={selectedDocumentId}
+          span={selectedSpan}
           onClose={handleClosePreview}
         />
       )}
@@ -144,6 +144,20 @@ export default function DocumentList({ refresh, onDocumentSelect, onRefreshCompl
                     {docs.map((doc: Document) => (
                       <div key={doc.id} className="p-4 hover:bg-gray-50 transition-colors">
                         <div className="flex items-center justify-between">
+                          {doc.thumbnail_url && (
+                            <button
+                              onClick={() => onDocumentSelect(doc.id)}
+                              className="mr-3 flex-shrink-0"
+                              title="Preview document"
+                            >
+                              <img
+                                src={doc.thumbnail_url}
+                                alt={doc.filename}
+                                loading="lazy"
+                                className="w-12 h-12 object-cover rounded border"
+                              />
+                            </button>
+                          )}
                           <div className="flex-1">
                             <div className="flex items-center space-x-2">
                               <span className="font-medium text-gray-900">{doc.filename}</span>
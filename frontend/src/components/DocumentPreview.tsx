@@ -2,27 +2,31 @@
 
 import { useState, useEffect } from 'react';
 import { X, FileText, Image, FileIcon } from 'lucide-react';
-import { documentApi, DocumentPreview as DocumentPreviewType } from '@/lib/api';
+import { documentApi, DocumentPreview as DocumentPreviewType, DocumentSpan } from '@/lib/api';
+
+// Characters shown on either side of a cited passage
+const SPAN_CONTEXT = 300;
 
 interface DocumentPreviewProps {
   documentId: string;
+  span?: DocumentSpan;  // Cited passage to show instead of the stored snippet
   onClose: () => void;
 }
 
-export default function DocumentPreview({ documentId, onClose }: DocumentPreviewProps) {
+export default function DocumentPreview({ documentId, span, onClose }: DocumentPreviewProps) {
   const [document, setDocument] = useState<DocumentPreviewType | null>(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
 
   useEffect(() => {
     loadDocument();
-  }, [documentId]); // eslint-disable-line react-hooks/exhaustive-deps
+  }, [documentId, span]); // eslint-disable-line react-hooks/exhaustive-deps
 
-  const loadDocument = async () => {
+  const loadDocument = async (full = false) => {
     try {
       setLoading(true);
       setError(null);
-      const doc = await documentApi.getDocumentPreview(documentId);
+      const doc = await documentApi.getDocumentPreview(documentId, full, span, SPAN_CONTEXT);
       setDocument(doc);
     } catch (err) {
       console.error('Failed to load document:', err);
@@ -45,6 +49,23 @@ export default function DocumentPreview({ documentId, onClose }: DocumentPreview
     }
   };
 
+  const renderText = () => {
+    if (!document?.content) return 'No content available';
+    const content = document.content;
+    if (!span || document.span_start == null) return content;
+
+    // Highlight the cited passage within the surrounding context
+    const start = Math.max(0, span.start - document.span_start);
+    const end = Math.max(start, span.end - document.span_start);
+    return (
+      <>
+        {content.slice(0, start)}
+        <mark className="bg-yellow-200">{content.slice(start, end)}</mark>
+        {content.slice(end)}
+      </>
+    );
+  };
+
   const renderContent = () => {
     if (!document) return null;
 
@@ -52,21 +73,55 @@ export default function DocumentPreview({ documentId, onClose }: DocumentPreview
       case 'txt':
       case 'pdf':
         return (
-          <div className="bg-gray-50 p-4 rounded-lg max-h-96 overflow-y-auto">
-            <pre className="whitespace-pre-wrap text-sm font-mono">
-              {document.content || 'No content available'}
-            </pre>
+          <div className="space-y-4">
+            {document.thumbnail_url && (
+              <a href={document.file_url} target="_blank" rel="noopener noreferrer">
+                <img
+                  src={document.thumbnail_url}
+                  alt={document.filename}
+                  loading="lazy"
+                  className="max-h-48 rounded-lg border"
+                />
+              </a>
+            )}
+            <div className="bg-gray-50 p-4 rounded-lg max-h-96 overflow-y-auto">
+              <pre className="whitespace-pre-wrap text-sm font-mono">
+                {renderText()}
+              </pre>
+            </div>
+            {(document.content_truncated || document.span_start != null) && (
+              <button
+                onClick={() => loadDocument(true)}
+                className="text-sm text-blue-600 hover:underline"
+              >
+                Show full document
+              </button>
+            )}
           </div>
         );
       case 'img':
         return (
           <div className="text-center">
-            {document.file_url ? (
-              <img
-                src={document.file_url}
-                alt={document.filename}
-                className="max-w-full max-h-96 mx-auto rounded-lg"
-              />
+            {document.thumbnail_url || document.file_url ? (
+              <div className="space-y-2">
+                <a href={document.file_url} target="_blank" rel="noopener noreferrer">
+                  <img
+                    src={document.thumbnail_url || document.file_url}
+                    alt={document.filename}
+                    className="max-w-full max-h-96 mx-auto rounded-lg"
+                  />
+                </a>
+                {document.thumbnail_url && document.file_url && (
+                  <a
+                    href={document.file_url}
+                    target="_blank"
+                    rel="noopener noreferrer"
+                    className="text-sm text-blue-600 hover:underline"
+                  >
+                    Open original
+                  </a>
+                )}
+              </div>
             ) : (
               <div className="bg-gray-50 p-8 rounded-lg">
                 <Image className="w-16 h-16 mx-auto mb-4 text-gray-400" />
@@ -2,7 +2,7 @@
 
 import { useState } from 'react';
 import { Send, MessageCircle, FileText, Loader2 } from 'lucide-react';
-import { chatApi, ChatResponse } from '@/lib/api';
+import { chatApi, ChatResponse, DocumentSpan, RankedPassage } from '@/lib/api';
 
 interface ChatMessage {
   id: string;
@@ -10,10 +10,11 @@ interface ChatMessage {
   content: string;
   timestamp: Date;
   citations?: ChatResponse['document_details'];
+  passages?: RankedPassage[];
 }
 
 interface QAInterfaceProps {
-  onDocumentSelect: (documentId: string) => void;
+  onDocumentSelect: (documentId: string, span?: DocumentSpan) => void;
 }
 
 export default function QAInterface({ onDocumentSelect }: QAInterfaceProps) {
@@ -45,6 +46,7 @@ export default function QAInterface({ onDocumentSelect }: QAInterfaceProps) {
         content: response.answer,
         timestamp: new Date(),
         citations: response.document_details,
+        passages: response.citations,
       };
 
       setMessages(prev => [...prev, assistantMessage]);
@@ -97,7 +99,27 @@ export default function QAInterface({ onDocumentSelect }: QAInterfaceProps) {
                 >
                   <div className="whitespace-pre-wrap">{message.content}</div>
                   
-                  {message.citations && message.citations.length > 0 && (
+                  {message.passages && message.passages.length > 0 ? (
+                    <div className="mt-3 pt-3 border-t border-gray-200">
+                      <div className="text-sm text-gray-600 mb-2">Sources:</div>
+                      <div className="space-y-1">
+                        {message.passages.map((passage) => (
+                          <button
+                            key={passage.label}
+                            onClick={() => onDocumentSelect(passage.document_id, { start: passage.start, end: passage.end })}
+                            className="flex items-center space-x-2 text-xs bg-white bg-opacity-20 hover:bg-opacity-30 rounded px-2 py-1 transition-colors"
+                            title="Show the cited passage"
+                          >
+                            <FileText className="w-3 h-3" />
+                            <span>
+                              [{passage.label}] {passage.filename}
+                              {passage.page != null && `, p. ${passage.page}`}
+                            </span>
+                          </button>
+                        ))}
+                      </div>
+                    </div>
+                  ) : message.citations && message.citations.length > 0 && (
                     <div className="mt-3 pt-3 border-t border-gray-200">
                       <div className="text-sm text-gray-600 mb-2">Sources:</div>
                       <div className="space-y-1">
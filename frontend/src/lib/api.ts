@@ -16,7 +16,14 @@ export interface Document {
   file_type: 'txt' | 'img' | 'pdf';
   file_size: number;
   upload_date: string;
+  collection_id?: string;
   metadata?: Record<string, unknown>;
+  thumbnail_url?: string;
+}
+
+export interface CollectionSummary {
+  collection_id: string;
+  document_count: number;
 }
 
 export interface DocumentPreview {
@@ -24,7 +31,17 @@ export interface DocumentPreview {
   filename: string;
   file_type: 'txt' | 'img' | 'pdf';
   content?: string;
+  content_truncated?: boolean;
   file_url?: string;
+  thumbnail_url?: string;
+  span_start?: number;
+  span_end?: number;
+}
+
+// Character offsets into a document's extracted text
+export interface DocumentSpan {
+  start: number;
+  end: number;
 }
 
 export interface DocumentsByCategory {
@@ -33,6 +50,16 @@ export interface DocumentsByCategory {
   pdf: Document[];
 }
 
+export interface RankedPassage {
+  label: number;
+  document_id: string;
+  filename: string;
+  page?: number | null;
+  start: number;
+  end: number;
+  score: number;
+}
+
 export interface ChatResponse {
   answer: string;
   cited_documents: string[];
@@ -41,11 +68,14 @@ export interface ChatResponse {
     filename: string;
     file_type: string;
   }[];
+  passages?: RankedPassage[];
+  citations?: RankedPassage[];
+  collection_id?: string;
 }
 
 // API functions
 export const documentApi = {
-  async uploadDocuments(files: FileList): Promise<Document[]> {
+  async uploadDocuments(files: FileList, collectionId?: string): Promise<Document[]> {
     const formData = new FormData();
     Array.from(files).forEach(file => {
       formData.append('files', file);
@@ -55,18 +85,29 @@ export const documentApi = {
       headers: {
         'Content-Type': 'multipart/form-data',
       },
+      params: collectionId ? { collection_id: collectionId } : undefined,
     });
     
     return response.data;
   },
 
-  async getDocumentsByCategory(): Promise<DocumentsByCategory> {
-    const response = await api.get('/api/documents/by-category');
+  async getDocumentsByCategory(collectionId?: string): Promise<DocumentsByCategory> {
+    const response = await api.get('/api/documents/by-category', {
+      params: collectionId ? { collection_id: collectionId } : undefined,
+    });
+    return response.data;
+  },
+
+  async getCollections(): Promise<CollectionSummary[]> {
+    const response = await api.get('/api/documents/collections');
     return response.data;
   },
 
-  async getDocumentPreview(documentId: string): Promise<DocumentPreview> {
-    const response = await api.get(`/api/documents/${documentId}/preview`);
+  async getDocumentPreview(documentId: string, full = false, span?: DocumentSpan, context = 0): Promise<DocumentPreview> {
+    const params = span && !full
+      ? { start: span.start, end: span.end, context }
+      : full ? { full: true } : undefined;
+    const response = await api.get(`/api/documents/${documentId}/preview`, { params });
     return response.data;
   },
 
@@ -76,8 +117,8 @@ export const documentApi = {
 };
 
 export const chatApi = {
-  async askQuestion(question: string): Promise<ChatResponse> {
-    const response = await api.post('/api/chat/', { question });
+  async askQuestion(question: string, collectionId?: string): Promise<ChatResponse> {
+    const response = await api.post('/api/chat/', { question, collection_id: collectionId });
     return response.data;
   },
 };
\ No newline at end of file